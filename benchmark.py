@@ -0,0 +1,339 @@
+"""Banc d'essai du chemin critique de conversion (sans interface graphique)
+
+Génère des jeux de pages synthétiques (tailles, modes RGB/RGBA/P/L, formats
+PNG/JPEG/TIFF, de 10 à 2000 pages), construit des CBZ et des EPUB et mesure
+le débit (pages/s, Mo/s écrits), le pic de mémoire (RSS) et la répartition
+du temps entre décodage, conversion, encodage et écriture de l'archive.
+Chaque scénario tourne dans un processus séparé pour que le pic de mémoire
+de l'un ne fausse pas les suivants.
+
+Exemples :
+    python benchmark.py -o resultats.json
+    python benchmark.py --pages 10 500 2000 --modes RGBA P --formats png -o resultats.json
+    python benchmark.py --compare ancien.json -o nouveau.json
+    python benchmark.py --conversion --sizes 2400x3200
+"""
+import sys
+import os
+import json
+import time
+import platform
+import argparse
+import itertools
+import subprocess
+import tempfile
+import multiprocessing
+
+try:
+    import resource
+except ImportError:
+    # Windows : pas de mesure du pic de mémoire
+    resource = None
+
+# Nombre de fonds générés par jeu de pages ; chaque page y ajoute son numéro
+DISTINCT_PAGES = 10
+# Un scénario est une régression si son débit baisse de plus de ce seuil
+REGRESSION_THRESHOLD = 0.10
+# Fond et texte opaques du numéro de page, par mode (index de la palette pour P)
+STAMP_COLORS = {
+    'L': (255, 0),
+    'P': (255, 0),
+    'RGB': ((255, 255, 255), (0, 0, 0)),
+    'RGBA': ((255, 255, 255, 255), (0, 0, 0, 255)),
+}
+SAVE_FORMATS = {'png': 'PNG', 'jpeg': 'JPEG', 'tiff': 'TIFF'}
+# Modes comparés par --conversion : (nom, mode de make_page, conversion de la page générée)
+CONVERSION_CASES = [
+    ('RGB', 'RGB', None),
+    ('RGBA opaque', 'RGB', 'RGBA'),
+    ('RGBA transparent', 'RGBA', None),
+    ('LA', 'RGBA', 'LA'),
+    ('P', 'P', None),
+    ('P transparent', 'P', 'transparency'),
+    ('L', 'L', None),
+    ('I;16', 'L', 'I;16'),
+    ('CMYK', 'RGB', 'CMYK'),
+]
+
+
+def make_page(size, mode, seed):
+    """Créer une page synthétique : dégradé, bruit et aplats, proche d'une page scannée"""
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    base = Image.linear_gradient('L').resize(size)
+    noise = Image.effect_noise(size, 20 + seed)
+    gray = Image.blend(base, noise, 0.3)
+    draw = ImageDraw.Draw(gray)
+    for i in range(8):
+        x = (seed * 97 + i * 131) % width
+        y = (seed * 53 + i * 211) % height
+        draw.rectangle([x, y, x + width // 6, y + height // 10], fill=(i * 37) % 256)
+
+    if mode == 'L':
+        return gray
+    rgb = Image.merge('RGB', (gray, gray.rotate(90, expand=False), noise))
+    if mode == 'RGB':
+        return rgb
+    if mode == 'RGBA':
+        rgb.putalpha(Image.linear_gradient('L').rotate(45).resize(size))
+        return rgb
+    return rgb.quantize(64)
+
+
+def generate_pages(directory, size, mode, image_format, pages):
+    """Générer un jeu de pages synthétiques dans un dossier et retourner leurs chemins
+
+    Les pages reprennent DISTINCT_PAGES fonds, mais chacune porte son numéro :
+    toutes sont différentes, et le dédoublonnage des EPUB ne fausse pas le
+    volume écrit.
+    """
+    from PIL import ImageDraw
+
+    extension = 'jpg' if image_format == 'jpeg' else image_format
+    paths = [os.path.join(directory, f"page_{i + 1:04d}.{extension}") for i in range(pages)]
+    for seed in range(min(DISTINCT_PAGES, pages)):
+        base = make_page(size, mode, seed)
+        for i in range(seed, pages, DISTINCT_PAGES):
+            page = base.copy()
+            draw = ImageDraw.Draw(page)
+            draw.rectangle([0, 0, 60, 20], fill=STAMP_COLORS[mode][0])
+            draw.text((4, 4), f"{i + 1}", fill=STAMP_COLORS[mode][1])
+            page.save(paths[i], SAVE_FORMATS[image_format])
+    return paths
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus et de ses processus fils terminés, en Mo"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss est en octets sous macOS, en kilo-octets ailleurs
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def conversion_page(size, case):
+    """Page de test pour la comparaison des conversions de mode"""
+    _, mode, variant = case
+    img = make_page(size, mode, 0)
+    if variant == 'transparency':
+        img.info['transparency'] = img.getpixel((0, 0))
+    elif variant == 'I;16':
+        img = img.convert('I').point(lambda value: value * 257).convert('I;16')
+    elif variant:
+        img = img.convert(variant)
+    return img
+
+
+def legacy_convert_to_rgb(img):
+    """Conversion d'avant l'aplatissement vectorisé, gardée comme référence"""
+    from PIL import Image
+
+    if img.mode in ('RGBA', 'LA', 'P'):
+        rgb_img = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        rgb_img.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+        img = rgb_img
+    return img
+
+
+def run_conversion(size, repeat):
+    """Comparer l'ancienne et la nouvelle conversion de mode : durée et allocations Pillow par page"""
+    from PIL import Image
+    from converter import convert_to_rgb
+
+    results = []
+    for case in CONVERSION_CASES:
+        img = conversion_page(size, case)
+        for name, function in (('ancienne', legacy_convert_to_rgb), ('nouvelle', convert_to_rgb)):
+            Image.core.reset_stats()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                function(img)
+            elapsed = time.perf_counter() - start
+            stats = Image.core.get_stats()
+            results.append({
+                'case': case[0],
+                'implementation': name,
+                'ms_per_page': elapsed / repeat * 1000,
+                'images_per_page': stats['new_count'] / repeat,
+                'blocks_per_page': stats['allocated_blocks'] / repeat,
+            })
+    return results
+
+
+def run_scenario(scenario):
+    """Construire une archive pour un scénario et retourner ses mesures"""
+    from converter import BookConverter, PAGE_COPIED
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as work_dir:
+        source_dir = os.path.join(work_dir, "pages")
+        os.makedirs(source_dir)
+        paths = generate_pages(source_dir, tuple(scenario['size']), scenario['mode'],
+                               scenario['format'], scenario['pages'])
+        input_bytes = sum(os.path.getsize(path) for path in paths)
+
+        converter = BookConverter(
+            paths, "benchmark", work_dir, False, scenario['output'],
+            max_workers=scenario['workers'], passthrough=scenario['passthrough'],
+            profile=scenario['profile'], codec=scenario.get('codec', 'jpeg')
+        )
+        errors = []
+        converter.on_result = lambda message, success: None if success else errors.append(message)
+
+        start = time.perf_counter()
+        success = converter.convert()
+        elapsed = time.perf_counter() - start
+        output_bytes = os.path.getsize(converter.output_path) if success else 0
+
+    return {
+        'success': success,
+        'errors': errors[:5],
+        'elapsed': elapsed,
+        'pages_per_second': scenario['pages'] / elapsed,
+        'input_mb': input_bytes / 1e6,
+        'output_mb': output_bytes / 1e6,
+        'mb_per_second': output_bytes / 1e6 / elapsed,
+        'peak_rss_mb': peak_rss_mb(),
+        # Temps cumulés sur tous les processus du pool, sauf l'écriture de l'archive
+        'seconds': dict(converter.timings),
+        'pages_copied': sum(1 for _, _, action in converter.page_report if action == PAGE_COPIED),
+    }
+
+
+def scenarios_from_args(args):
+    """Produit cartésien des paramètres, sans les combinaisons impossibles"""
+    for size, mode, image_format, pages, output, codec in itertools.product(
+            args.sizes, args.modes, args.formats, args.pages, args.outputs, args.codecs):
+        # JPEG ne stocke ni transparence ni palette
+        if image_format == 'jpeg' and mode in ('RGBA', 'P'):
+            continue
+        width, height = (int(value) for value in size.lower().split('x'))
+        yield {
+            'size': [width, height],
+            'mode': mode,
+            'format': image_format,
+            'pages': pages,
+            'output': output,
+            'workers': args.workers,
+            'passthrough': not args.no_passthrough,
+            'profile': args.profile,
+            'codec': codec,
+        }
+
+
+def scenario_name(scenario):
+    width, height = scenario['size']
+    # Le codec par défaut n'apparaît pas, pour rester comparable aux résultats précédents
+    codec = scenario.get('codec', 'jpeg')
+    return (f"{scenario['output']}-{scenario['format']}-{scenario['mode']}-"
+            f"{width}x{height}-{scenario['pages']}p" + ("" if codec == 'jpeg' else f"-{codec}"))
+
+
+def compare(results, previous_path):
+    """Comparer le débit avec un résultat précédent ; retourne les scénarios en régression"""
+    with open(previous_path, encoding="utf-8") as f:
+        previous = {result['name']: result for result in json.load(f)['results']}
+
+    regressions = []
+    for result in results:
+        before = previous.get(result['name'])
+        if not before or not before['success'] or not result['success']:
+            continue
+        ratio = result['pages_per_second'] / before['pages_per_second']
+        flag = ""
+        if ratio < 1 - REGRESSION_THRESHOLD:
+            regressions.append(result['name'])
+            flag = "  ⚠️ régression"
+        print(f"{result['name']:<40} {before['pages_per_second']:8.1f} → {result['pages_per_second']:8.1f} pages/s "
+              f"({ratio - 1:+.0%}){flag}")
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Banc d'essai de la conversion d'images en CBZ/EPUB.")
+    parser.add_argument("--sizes", nargs="+", default=["1200x1600"], help="tailles des pages, LARGEURxHAUTEUR")
+    parser.add_argument("--modes", nargs="+", choices=["RGB", "RGBA", "P", "L"], default=["RGB", "RGBA", "P", "L"])
+    parser.add_argument("--formats", nargs="+", choices=list(SAVE_FORMATS), default=list(SAVE_FORMATS))
+    parser.add_argument("--pages", nargs="+", type=int, default=[10, 100], help="nombres de pages (10 à 2000)")
+    parser.add_argument("--outputs", nargs="+", choices=["cbz", "epub"], default=["cbz", "epub"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--profile", default="original", help="profil de sortie (voir converter.PROFILES)")
+    parser.add_argument("--codecs", nargs="+", default=["jpeg"],
+                        help="codecs des pages à comparer (voir converter.CODECS)")
+    parser.add_argument("--no-passthrough", action="store_true", help="réencoder aussi les JPEG compatibles")
+    parser.add_argument("-o", "--output", help="fichier JSON des résultats")
+    parser.add_argument("--compare", help="résultats JSON précédents à comparer")
+    parser.add_argument("--conversion", action="store_true",
+                        help="comparer seulement l'ancienne et la nouvelle conversion de mode (durée, allocations)")
+    parser.add_argument("--repeat", type=int, default=5, help="répétitions par page pour --conversion")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Mode interne : un seul scénario, exécuté dans ce processus
+    if args.scenario:
+        print(json.dumps(run_scenario(json.loads(args.scenario))))
+        return 0
+
+    from PIL import __version__ as pillow_version
+
+    if args.conversion:
+        results = []
+        for size in args.sizes:
+            width, height = (int(value) for value in size.lower().split('x'))
+            for result in run_conversion((width, height), args.repeat):
+                results.append({'size': [width, height], **result})
+                print(f"{result['case']:<18} {size:>10} {result['implementation']:<9} "
+                      f"{result['ms_per_page']:8.1f} ms/page {result['images_per_page']:4.1f} images "
+                      f"{result['blocks_per_page']:5.1f} blocs alloués par page", flush=True)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({'pillow': pillow_version, 'conversion': results}, f, indent=2, ensure_ascii=False)
+        return 0
+
+    results = []
+    for scenario in scenarios_from_args(args):
+        name = scenario_name(scenario)
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--scenario", json.dumps(scenario)],
+            capture_output=True, text=True, encoding="utf-8"
+        )
+        if completed.returncode != 0:
+            print(f"❌ {name} : {completed.stderr.strip().splitlines()[-1:]}", file=sys.stderr)
+            continue
+
+        metrics = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append({'name': name, 'scenario': scenario, **metrics})
+        seconds = metrics['seconds']
+        rss = f"{metrics['peak_rss_mb']:.0f} Mo" if metrics['peak_rss_mb'] is not None else "n/d"
+        print(f"{name:<40} {metrics['pages_per_second']:8.1f} pages/s {metrics['mb_per_second']:7.1f} Mo/s "
+              f"{metrics['output_mb']:7.1f} Mo "
+              f"RSS {rss:>7}  décodage {seconds['decode']:.2f} s, conversion {seconds['convert']:.2f} s, "
+              f"encodage {seconds['encode']:.2f} s, zip {seconds['write']:.2f} s", flush=True)
+
+    report = {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pillow': pillow_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""Magasin disque des pages encodées, pour ne réencoder que les pages nouvelles ou modifiées
+
+Les pages encodées sont stockées par adresse de contenu : chaque fichier est
+nommé d'après l'empreinte SHA-256 de ses octets, si bien que deux sources qui
+donnent la même page (crédits, pages de couverture communes à une série) ne
+sont stockées qu'une fois. Un index associe à chaque page rencontrée (empreinte
+de la source et réglages d'encodage) la page encodée, ainsi que l'empreinte
+SHA-256 des pixels de la page décodée : une source aux octets différents mais
+qui donne exactement les mêmes pixels (métadonnées changées, PNG recompressé)
+retrouve la page déjà encodée.
+"""
+import os
+import sys
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 2 * 1024 ** 3
+INDEX_NAME = 'index.jsonl'
+# Sous-dossier des marques d'empreintes de pixels, lues par les processus du pool (voir pixels_dir)
+PIXELS_DIR = 'pixels'
+
+
+def default_cache_dir():
+    """Dossier de cache par défaut selon le système"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'image_to_book', 'pages')
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Empreinte SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PageCache:
+    """Magasin LRU de pages encodées, adressé par contenu et borné en taille
+
+    Une page encodée est stockée dans <dossier>/<ab>/<empreinte des octets> ;
+    la date de modification sert d'horodatage d'accès, ce qui permet de
+    retrouver l'ordre LRU au redémarrage. L'index <dossier>/index.jsonl (une
+    ligne JSON par page ajoutée) relie les clés (empreinte de la source et
+    réglages d'encodage, voir key) aux pages stockées, avec l'empreinte
+    des pixels de la source décodée par jeu de réglages. Le magasin peut être
+    partagé entre plusieurs conversions et plusieurs livres.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_CACHE_SIZE):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(self.directory, INDEX_NAME)
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.keys = {}
+        self.pixels = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.similar_hits = 0
+        self.bytes_saved = 0
+        self.deduplicated = 0
+        self.dedup_bytes = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self.load_index()
+
+    def load_index(self):
+        """Reconstruire l'ordre LRU à partir des fichiers présents, puis relire l'index des clés"""
+        found = []
+        for root, dirs, files in os.walk(self.directory):
+            if root == self.directory:
+                # Les marques d'empreintes ne sont pas des pages stockées
+                dirs[:] = [name for name in dirs if name != PIXELS_DIR]
+                continue
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                found.append((stat.st_mtime, name, stat.st_size))
+
+        for _, digest, size in sorted(found):
+            self.entries[digest] = size
+            self.total_bytes += size
+
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        records = []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Ligne tronquée par un arrêt brutal
+                continue
+            # Les pages évincées ne sont plus référencées
+            if record.get('blob') in self.entries:
+                records.append(record)
+                self.index_record(record)
+        if len(records) < len(lines) // 2:
+            self.compact_index(records)
+
+    def index_record(self, record):
+        self.keys[record['key']] = record['blob']
+        # Les lignes sans empreinte des pixels (anciens index) ne servent qu'aux recherches par clé
+        if record.get('settings') and record.get('pixels'):
+            self.pixels.setdefault(record['settings'], {})[record['pixels']] = record['key']
+
+    def compact_index(self, records):
+        """Réécrire l'index sans les lignes des pages évincées"""
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+        os.replace(temp_path, self.index_path)
+        self.prune_markers()
+
+    def prune_markers(self):
+        """Supprimer les marques d'empreintes des pages qui ne sont plus dans l'index"""
+        root = os.path.join(self.directory, PIXELS_DIR)
+        if not os.path.isdir(root):
+            return
+        for settings_id in os.listdir(root):
+            indexed = self.pixels.get(settings_id, {})
+            folder = os.path.join(root, settings_id)
+            for name in os.listdir(folder):
+                if name not in indexed:
+                    try:
+                        os.remove(os.path.join(folder, name))
+                    except OSError:
+                        pass
+
+    @staticmethod
+    def key(source_digest, settings):
+        """Clé d'une entrée : empreinte de la source et réglages d'encodage"""
+        payload = json.dumps(settings, sort_keys=True)
+        return hashlib.sha256(f"{source_digest}:{payload}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def settings_id(settings):
+        """Identifiant d'un jeu de réglages : seules les pages encodées pareil sont comparées"""
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    def pixels_dir(self, settings_id):
+        """Dossier des marques d'empreintes de pixels d'un jeu de réglages
+
+        Un fichier vide par page indexée, nommé d'après l'empreinte de ses
+        pixels : un processus du pool sait en un os.path.exists si sa page
+        est déjà dans le magasin, sans que l'index ne lui soit transmis.
+        Une marque peut survivre à sa page évincée ; get_similar le vérifie.
+        """
+        return os.path.join(self.directory, PIXELS_DIR, settings_id)
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def read_blob(self, digest):
+        """Lire une page stockée et la marquer comme récemment utilisée ; None si elle a disparu"""
+        path = self.path_for(digest)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            # Page supprimée par un autre processus
+            with self.lock:
+                self.total_bytes -= self.entries.pop(digest, 0)
+            return None
+        return data
+
+    def get(self, key):
+        """Retourner les octets d'une page encodée, ou None si elle n'est pas en cache"""
+        with self.lock:
+            digest = self.keys.get(key)
+            if digest not in self.entries:
+                return None
+            self.entries.move_to_end(digest)
+
+        data = self.read_blob(digest)
+        if data is not None:
+            with self.lock:
+                self.hits += 1
+                self.bytes_saved += len(data)
+        return data
+
+    def get_similar(self, key, settings_id, pixels):
+        """Page déjà encodée d'une source aux pixels identiques, ou None
+
+        La clé de la nouvelle source est ajoutée à l'index : la prochaine
+        fois, elle est retrouvée directement par get.
+        """
+        with self.lock:
+            digest = self.keys.get(self.pixels.get(settings_id, {}).get(pixels))
+            if digest not in self.entries:
+                return None
+            self.entries.move_to_end(digest)
+
+        data = self.read_blob(digest)
+        if data is None:
+            return None
+        self.add_record(key, digest, settings_id, pixels)
+        with self.lock:
+            self.similar_hits += 1
+            self.bytes_saved += len(data)
+        return data
+
+    def put(self, key, data, settings_id=None, pixels=None):
+        """Ajouter une page encodée (compte comme un défaut de cache) et évincer les plus anciennes
+
+        Une page déjà stockée (mêmes octets) n'est pas écrite une seconde fois.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        with self.lock:
+            self.misses += 1
+            stored = digest in self.entries
+            if stored:
+                self.entries.move_to_end(digest)
+                self.deduplicated += 1
+                self.dedup_bytes += len(data)
+
+        if stored:
+            try:
+                os.utime(path)
+            except OSError:
+                stored = False
+        if not stored:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Écriture atomique : un lecteur ne voit jamais d'entrée tronquée
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        self.add_record(key, digest, settings_id, pixels)
+
+        with self.lock:
+            if not stored:
+                self.total_bytes += len(data) - self.entries.pop(digest, 0)
+                self.entries[digest] = len(data)
+            evicted = []
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old_digest, size = self.entries.popitem(last=False)
+                self.total_bytes -= size
+                evicted.append(old_digest)
+
+        for old_digest in evicted:
+            try:
+                os.remove(self.path_for(old_digest))
+            except OSError:
+                pass
+
+    def add_record(self, key, digest, settings_id=None, pixels=None):
+        """Relier une clé à une page stockée, dans l'index en mémoire et dans le fichier d'index"""
+        record = {'key': key, 'blob': digest}
+        if settings_id is not None and pixels is not None:
+            record.update(settings=settings_id, pixels=pixels)
+            marker_dir = self.pixels_dir(settings_id)
+            os.makedirs(marker_dir, exist_ok=True)
+            open(os.path.join(marker_dir, pixels), 'a').close()
+        with self.lock:
+            self.index_record(record)
+            # Une ligne par écriture, en ajout : plusieurs processus peuvent partager l'index
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+
+    def stats(self):
+        """Statistiques d'utilisation : succès, défauts, taux de succès, octets économisés et dédoublonnés"""
+        with self.lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                'hits': self.hits,
+                'similar_hits': self.similar_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.similar_hits) / lookups if lookups else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'deduplicated': self.deduplicated,
+                'dedup_bytes': self.dedup_bytes,
+                'entries': len(self.entries),
+                'size': self.total_bytes,
+            }
@@ -0,0 +1,214 @@
+"""Conversion en ligne de commande (sans interface graphique) d'un lot de dossiers d'images ou d'archives
+
+Exemples :
+    python cli.py chapitre_01 chapitre_02 -o sortie -f epub
+    python cli.py tome1.cbz tome2.cbr scan.pdf -o epubs -f epub
+    python cli.py --manifest lot.json --books 4 --workers 8
+    python cli.py chapitre_01 --trace trace.json
+    python cli.py tome1.cbz chapitre_02 --preflight
+
+Le manifeste est un fichier JSON contenant une liste de livres :
+    [{"name": "Tome 1", "input": "scans/tome1"},
+     {"name": "Tome 2", "pages": ["a.png", "b.png"], "format": "epub", "output": "epubs"},
+     {"name": "Tome 3", "input": "archives/tome3.cbz"}]
+Les chemins relatifs sont résolus par rapport au dossier du manifeste. Une
+entrée « input » ou « pages » peut être une archive CBZ/ZIP, CBR/RAR ou PDF :
+ses pages sont lues directement, dans l'ordre naturel des noms d'entrée.
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from converter import (
+    BookConverter, DEFAULT_DEFLATE_LEVEL, DEFAULT_PROFILE, DEFAULT_MEMORY_BUDGET, PROFILES, CODECS,
+    DEFAULT_CODEC, create_page_executor
+)
+from cache import PageCache, DEFAULT_CACHE_SIZE
+from tracing import PageTracer
+from preflight import preflight, report_lines
+from sources import expand_sources, book_name, book_pages
+
+
+def load_manifest(manifest_path, default_format, default_output):
+    """Lire un manifeste JSON et retourner la liste des livres à convertir"""
+    with open(manifest_path, encoding="utf-8") as f:
+        entries = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    books = []
+    for entry in entries:
+        if "pages" in entry:
+            pages = expand_sources([os.path.join(base_dir, page) for page in entry["pages"]])
+        else:
+            pages = book_pages(os.path.join(base_dir, entry["input"]))
+        name = entry.get("name") or book_name(entry["input"])
+        output = os.path.join(base_dir, entry["output"]) if "output" in entry else default_output
+        books.append((name, pages, entry.get("format", default_format), output))
+    return books
+
+
+def create_converter(args, book, executor=None, cache=None, tracer=None):
+    name, pages, output_format, output = book
+    return BookConverter(
+        pages, name, output, args.separate_folder, output_format,
+        max_workers=args.workers, passthrough=not args.no_passthrough,
+        deflate_level=args.deflate_level, executor=executor, cache=cache,
+        profile=args.profile, quality=args.quality, codec=args.codec, grayscale=not args.no_grayscale,
+        target_bytes=args.target_kb * 1024 if args.target_kb else None,
+        autocrop=args.autocrop, deskew=args.deskew, split_spreads=args.split_spreads, right_to_left=args.rtl,
+        max_in_flight=args.max_in_flight, memory_budget=args.memory_budget * 1024 ** 2,
+        tracer=tracer, resume=not args.no_resume
+    )
+
+
+def preflight_books(args, books):
+    """Vérifier les livres sans les convertir ; retourne le nombre de pages illisibles ou tronquées"""
+    problems = 0
+    for book in books:
+        converter = create_converter(args, book)
+        report = preflight(converter.png_paths, converter.encode_args(), args.workers)
+        print(f"🔍 {book[0]} ({book[2]})")
+        for line in report_lines(report):
+            print(f"   {line}")
+        problems += len(report['errors']) + len(report['truncated'])
+    return problems
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Convertir des dossiers d'images en CBZ/EPUB, par lot.")
+    parser.add_argument("inputs", nargs="*",
+                        help="dossiers d'images ou archives CBZ/ZIP/CBR/PDF (un livre par dossier ou archive)")
+    parser.add_argument("-m", "--manifest", help="manifeste JSON décrivant les livres à convertir")
+    parser.add_argument("-f", "--format", choices=["cbz", "epub"], default="cbz", help="format de sortie (défaut : cbz)")
+    parser.add_argument("-o", "--output", default=".", help="dossier de sortie (défaut : dossier courant)")
+    parser.add_argument("--separate-folder", action="store_true",
+                        help="enregistrer dans un sous-dossier CBZ_Converted/EPUB_Converted")
+    parser.add_argument("--books", type=int, default=2, help="nombre de livres convertis en même temps (défaut : 2)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="taille du pool de processus partagé pour l'encodage des pages")
+    parser.add_argument("-p", "--profile", choices=list(PROFILES), default=DEFAULT_PROFILE,
+                        help="profil de sortie (taille cible de la liseuse)")
+    parser.add_argument("--codec", choices=list(CODECS), default=DEFAULT_CODEC,
+                        help="codec des pages (défaut : jpeg ; webp, avif et jxl selon le Pillow installé)")
+    parser.add_argument("--quality", type=int,
+                        help="qualité d'encodage (défaut : celle du profil en JPEG, celle du codec sinon)")
+    parser.add_argument("--target-kb", type=int,
+                        help="taille visée par page en Ko : la qualité est réduite jusqu'à tenir dans cette taille")
+    parser.add_argument("--no-grayscale", action="store_true",
+                        help="garder en RGB les pages sans couleur au lieu de les enregistrer en niveaux de gris")
+    parser.add_argument("--autocrop", action="store_true", help="rogner les marges uniformes des pages scannées")
+    parser.add_argument("--split-spreads", action="store_true",
+                        help="couper en deux pages les doubles pages (images en paysage)")
+    parser.add_argument("--rtl", action="store_true",
+                        help="sens de lecture de droite à gauche (manga) : moitié droite d'abord, EPUB en rtl")
+    parser.add_argument("--deskew", action="store_true", help="redresser les pages scannées de travers (±3°)")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="pages en cours au plus par livre, de la lecture à l'écriture (défaut : 2 × workers)")
+    parser.add_argument("--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET // 1024 ** 2,
+                        help="budget mémoire estimé par livre, en Mo")
+    parser.add_argument("--no-passthrough", action="store_true", help="réencoder aussi les JPEG déjà compatibles")
+    parser.add_argument("--deflate-level", type=int, default=DEFAULT_DEFLATE_LEVEL,
+                        help="niveau de compression des fichiers XHTML/OPF/NCX")
+    parser.add_argument("--cache-dir", help="dossier du cache des pages encodées (défaut : cache utilisateur)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE // 1024 ** 2,
+                        help="taille maximale du cache en Mo")
+    parser.add_argument("--no-cache", action="store_true", help="ne pas utiliser le cache des pages encodées")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="ne pas reprendre les livres interrompus (journal <sortie>.journal) et repartir de zéro")
+    parser.add_argument("--trace", metavar="FICHIER",
+                        help="enregistrer les temps par page : JSON lines (.jsonl) ou Chrome trace (autre extension)")
+    parser.add_argument("--preflight", action="store_true",
+                        help="vérifier seulement les pages (illisibles, tronquées, en double) et estimer la sortie")
+    parser.add_argument("-q", "--quiet", action="store_true", help="n'afficher que les erreurs et le résumé")
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.manifest:
+        parser.error("indiquer au moins un dossier d'images ou un manifeste")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    books = []
+    unreadable = 0
+    for path in args.inputs:
+        try:
+            books.append((book_name(path), book_pages(path), args.format, args.output))
+        except Exception as e:
+            # Dossier absent, archive illisible ou module optionnel manquant : les autres livres sont convertis
+            print(f"❌ {path} : {e}", file=sys.stderr)
+            unreadable += 1
+    if args.manifest:
+        books.extend(load_manifest(args.manifest, args.format, args.output))
+
+    if args.preflight:
+        # Vérification seule : aucune archive n'est écrite
+        return 1 if preflight_books(args, books) or unreadable else 0
+
+    cache = None if args.no_cache else PageCache(args.cache_dir, args.cache_size * 1024 ** 2)
+    tracer = PageTracer(args.trace) if args.trace else None
+    print_lock = threading.Lock()
+
+    def report(message, stream=sys.stdout):
+        with print_lock:
+            print(message, file=stream, flush=True)
+
+    def convert_book(book, executor):
+        name, pages, output_format, output = book
+        os.makedirs(output, exist_ok=True)
+        converter = create_converter(args, book, executor, cache, tracer)
+        converter.on_result = lambda message, success: (
+            None if success else report(f"❌ {name} : {message}", sys.stderr))
+
+        start = time.perf_counter()
+        success = converter.convert()
+        elapsed = time.perf_counter() - start
+
+        size = os.path.getsize(converter.output_path) if success else 0
+        duplicates = converter.cache_stats['duplicates']
+        if success and not args.quiet:
+            report(f"✅ {converter.output_path} : {len(converter.page_report)} pages, "
+                   f"{size / 1e6:.1f} Mo en {elapsed:.1f} s"
+                   + (f", {duplicates} page(s) en double non stockée(s)" if duplicates else ""))
+        return success, len(converter.page_report), size, converter.cache_stats['duplicate_bytes'] if success else 0
+
+    start = time.perf_counter()
+    try:
+        with create_page_executor(args.workers) as executor:
+            with ThreadPoolExecutor(max_workers=max(args.books, 1)) as books_executor:
+                results = list(books_executor.map(lambda book: convert_book(book, executor), books))
+    finally:
+        if tracer is not None:
+            tracer.close()
+    elapsed = time.perf_counter() - start
+
+    # Résumé global du lot
+    succeeded = sum(1 for success, _, _, _ in results if success)
+    pages = sum(page_count for _, page_count, _, _ in results)
+    size = sum(book_size for _, _, book_size, _ in results)
+    duplicate_bytes = sum(saved for _, _, _, saved in results)
+    print(f"{succeeded}/{len(books) + unreadable} livre(s) converti(s), {pages} pages, {size / 1e6:.1f} Mo en {elapsed:.1f} s "
+          f"({pages / elapsed if elapsed else 0:.1f} pages/s, {size / 1e6 / elapsed if elapsed else 0:.1f} Mo/s)")
+    dedup_bytes = 0
+    if cache is not None:
+        stats = cache.stats()
+        dedup_bytes = stats['dedup_bytes']
+        print(f"Cache : {stats['hits'] + stats['similar_hits']} succès dont {stats['similar_hits']} par image identique, "
+              f"{stats['misses']} défauts ({stats['hit_rate']:.0%}), "
+              f"{stats['bytes_saved'] / 1e6:.1f} Mo non réencodés, {stats['size'] / 1e6:.1f} Mo utilisés")
+    if duplicate_bytes or dedup_bytes:
+        # Pages en double non stockées dans les EPUB, et pages déjà présentes dans le cache
+        print(f"Dédoublonnage : {(duplicate_bytes + dedup_bytes) / 1e6:.1f} Mo économisés "
+              f"({duplicate_bytes / 1e6:.1f} Mo dans les EPUB, {dedup_bytes / 1e6:.1f} Mo dans le cache)")
+
+    return 0 if succeeded == len(books) and not unreadable else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,1183 @@
+"""Construction des archives CBZ/EPUB à partir d'images, sans dépendance à Qt"""
+import os
+import io
+import math
+import json
+import time
+import uuid
+import queue
+import hashlib
+import zipfile
+import threading
+import contextlib
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from xml.sax.saxutils import escape
+from PIL import Image, UnidentifiedImageError
+
+try:
+    # Greffon optionnel qui ajoute JPEG XL à Pillow (pip install pillow-jxl-plugin)
+    import pillow_jxl
+except ImportError:
+    pillow_jxl = None
+
+from cache import PageCache
+from journal import ConversionJournal, restore_entries
+from profiles import JPEG_QUALITY, PROFILES, DEFAULT_PROFILE, CODECS, DEFAULT_CODEC
+from preprocess import MAX_CROP, is_spread, part_box, spread_parts, straighten_and_trim
+from sources import SourceReader, chapter_breaks, source_file
+
+PAGE_COPIED = "copiée"
+PAGE_TRANSCODED = "réencodée"
+PAGE_CACHED = "en cache"
+PAGE_SIMILAR = "en cache (image identique)"
+# Qualité minimale essayée pour tenir dans une taille cible par page
+MIN_QUALITY = 20
+# Écart maximal de la chrominance autour de 128 pour qu'une page RGB soit considérée en niveaux de gris
+GRAYSCALE_TOLERANCE = 3
+GRAYSCALE_PROBE_SIZE = 256
+
+# Pipeline borné : page lue en attente d'encodage, d'ordonnancement ou d'écriture
+PageTask = namedtuple('PageTask', ['index', 'data', 'size', 'cost', 'cache_key', 'cached', 'error', 'read_started',
+                                   'read', 'restored'])
+# Page traitée par un processus du pool : octets, action, durées par étape, processus, début du traitement
+# et empreinte des pixels de la source décodée (si le magasin de pages est utilisé)
+PageResult = namedtuple('PageResult', ['data', 'action', 'timings', 'pid', 'started', 'pixels'],
+                        defaults=(None,))
+# Réglages passés à encode_page après les octets de la page, dans l'ordre de ses paramètres
+EncodeArgs = namedtuple('EncodeArgs', ['passthrough', 'quality', 'target_box', 'resample', 'codec', 'grayscale',
+                                       'target_bytes', 'autocrop', 'deskew'])
+DEFAULT_MEMORY_BUDGET = 1024 ** 3
+STAGE_REPORT_INTERVAL = 0.25
+RESAMPLING = {
+    'nearest': Image.Resampling.NEAREST,
+    'bilinear': Image.Resampling.BILINEAR,
+    'bicubic': Image.Resampling.BICUBIC,
+    'lanczos': Image.Resampling.LANCZOS,
+}
+ORIENTATION_TAG = 0x0112
+# Octets examinés à la fin d'un fichier : des scanners ajoutent des octets nuls après le marqueur de fin
+TAIL_SIZE = 1024
+PNG_END = b'IEND\xaeB`\x82'
+
+# Les images sont déjà compressées : les dégonfler ne fait que coûter du CPU
+STORED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.jxl')
+DEFAULT_DEFLATE_LEVEL = 6
+# Taille d'une page EPUB dont l'en-tête n'a pas pu être lu (ne devrait pas arriver pour une page encodée)
+DEFAULT_PAGE_SIZE = (1200, 1600)
+# Ajouté au nom de la sortie quand elle remplacerait une archive source (CBZ réoptimisé dans son dossier)
+CONVERTED_SUFFIX = " (converti)"
+
+
+def transparency_table(img):
+    """Opacité de chaque entrée de la palette d'une image P (255 = opaque)"""
+    alphas = [255] * 256
+    transparency = img.info.get('transparency')
+    if isinstance(transparency, int):
+        alphas[transparency] = 0
+    elif isinstance(transparency, bytes):
+        alphas[:len(transparency)] = transparency
+    elif img.palette is not None and img.palette.mode == 'RGBA':
+        palette_alphas = img.palette.palette[3::4]
+        alphas[:len(palette_alphas)] = palette_alphas
+    return alphas
+
+
+def is_opaque(img):
+    """Vrai si l'image n'a aucun pixel transparent
+
+    Pour une image P, l'histogramme des indices dit quelles entrées de la
+    palette sont utilisées ; sinon seule la couche alpha est examinée (son
+    minimum), ce qui coûte bien moins que l'histogramme de toutes les couches.
+    """
+    if img.mode == 'P':
+        used = img.histogram()
+        return all(alpha == 255 or not used[i] for i, alpha in enumerate(transparency_table(img)))
+    return img.getchannel('A').getextrema()[0] == 255
+
+
+def flatten_palette(img):
+    """Aplatir une image P transparente sur fond blanc en ne changeant que sa palette
+
+    La composition sur un fond uni ne dépend que de l'entrée de palette de
+    chaque pixel : 256 couleurs à mélanger au lieu de chaque pixel.
+    """
+    colors = img.getpalette('RGB')
+    colors += [0] * (768 - len(colors))
+    alphas = transparency_table(img)
+    flattened = img.copy()
+    flattened.putpalette([(value * alphas[i // 3] + 255 * (255 - alphas[i // 3]) + 127) // 255
+                          for i, value in enumerate(colors)])
+    flattened.info.pop('transparency', None)
+    return flattened.convert('RGB')
+
+
+def convert_to_rgb(img):
+    """Convertir une image dans un mode enregistrable en JPEG : RGB, ou L pour les niveaux de gris
+
+    La transparence n'est aplatie sur fond blanc que si l'image contient
+    réellement des pixels transparents ; la composition se fait en une passe,
+    l'image servant directement de masque (sur la palette pour une image P).
+    """
+    mode = img.mode
+    if mode in ('RGB', 'L'):
+        return img
+    if mode == '1':
+        return img.convert('L')
+    if mode in ('RGBa', 'PA'):
+        img, mode = img.convert('RGBA'), 'RGBA'
+    elif mode == 'La':
+        img, mode = img.convert('LA'), 'LA'
+
+    if mode == 'P':
+        if is_opaque(img):
+            return img.convert('RGB')
+        return flatten_palette(img)
+    if mode in ('RGBA', 'LA'):
+        opaque_mode = mode[:-1]
+        if is_opaque(img):
+            return img.convert(opaque_mode)
+        background = Image.new(opaque_mode, img.size, 'white')
+        background.paste(img, mask=img)
+        return background
+
+    if mode.startswith('I'):
+        # 16 bits (PNG, TIFF) : ramener sur 8 bits, convert('L') écrêterait la page au blanc
+        if mode != 'I;16':
+            img = img.convert('I')
+        if mode != 'I' or img.getextrema()[1] > 255:
+            img = img.point(lambda value: value / 256)
+        return img.convert('L')
+    # CMYK, YCbCr, LAB, HSV, F...
+    return img.convert('RGB')
+
+
+def fitted_size(size, box):
+    """Taille d'une image réduite pour tenir dans la boîte, sans jamais l'agrandir"""
+    width, height = size
+    scale = min(box[0] / width, box[1] / height)
+    if scale >= 1:
+        return size
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def decode(img, target):
+    """Décoder une image ouverte, à échelle réduite si elle doit être réduite
+
+    Pour un JPEG, draft() fait travailler le décodeur directement à échelle
+    réduite (1/2, 1/4, 1/8) : le bitmap pleine taille n'est jamais construit.
+    """
+    if target != img.size:
+        img.draft(img.mode if img.mode in ('RGB', 'L') else None, target)
+    img.load()
+
+
+def downscale(img, target, resample):
+    """Réduire une image décodée à la taille cible
+
+    La transparence est aplatie avant la réduction : moins de couches à
+    rééchantillonner et pas de franges colorées au bord des zones
+    transparentes. reducing_gap fait une première réduction entière rapide
+    (reduce) avant le rééchantillonnage final.
+    """
+    img = convert_to_rgb(img)
+    if img.size == target:
+        return img
+    return img.resize(target, RESAMPLING[resample], reducing_gap=3.0)
+
+
+def compression_for(arcname, deflate_level=DEFAULT_DEFLATE_LEVEL):
+    """Choisir la compression d'une entrée d'archive : images stockées, texte compressé"""
+    if arcname == "mimetype" or arcname.lower().endswith(STORED_EXTENSIONS):
+        return zipfile.ZIP_STORED, None
+    return zipfile.ZIP_DEFLATED, deflate_level
+
+
+def has_standard_icc_profile(img):
+    """Vérifier que l'image n'a pas de profil couleur, ou seulement un profil sRGB"""
+    icc_profile = img.info.get('icc_profile')
+    if not icc_profile:
+        return True
+    try:
+        from PIL import ImageCms
+        profile = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+        return 'srgb' in ImageCms.getProfileDescription(profile).lower()
+    except Exception:
+        return False
+
+
+def is_truncated(data, image_format):
+    """Vrai si le fichier s'arrête avant son marqueur de fin ; None si le format n'est pas contrôlé"""
+    tail = data[-TAIL_SIZE:].rstrip(b'\x00')
+    if image_format == 'JPEG':
+        return not tail.endswith(b'\xff\xd9')
+    if image_format == 'PNG':
+        return not tail.endswith(PNG_END)
+    if image_format == 'GIF':
+        return not tail.endswith(b';')
+    if image_format == 'WEBP':
+        # La taille du bloc RIFF est annoncée dans l'en-tête
+        return len(data) < 8 + int.from_bytes(data[4:8], 'little')
+    return None
+
+
+def can_pass_through(img, data):
+    """Vérifier si une image peut être copiée telle quelle dans l'archive (JPEG de base RGB/L complet)
+
+    Seul l'en-tête est lu : un fichier tronqué est repéré à son marqueur de
+    fin absent, et passe par le décodage, qui signale l'erreur.
+    """
+    return (
+        img.format == 'JPEG'
+        and not is_truncated(data, img.format)
+        and img.mode in ('RGB', 'L')
+        and not img.info.get('progressive')
+        and img.getexif().get(ORIENTATION_TAG, 1) == 1
+        and has_standard_icc_profile(img)
+    )
+
+
+def estimate_page_memory(data, target_box=None):
+    """Estimer la mémoire nécessaire à une page (source, bitmap décodé et copie convertie) sans la décoder"""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+            if target_box and img.format == 'JPEG':
+                # draft() décode au plus au double de la taille cible
+                width, height = (min(value, 2 * fitted) for value, fitted
+                                 in zip(img.size, fitted_size(img.size, target_box)))
+            bitmap = width * height * max(len(img.getbands()), 3)
+    except Exception:
+        return len(data)
+    return len(data) + 2 * bitmap
+
+
+def image_size(data):
+    """Dimensions d'une page encodée, lues dans son en-tête sans décoder l'image (None si illisible)"""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def pixel_digest(img):
+    """Empreinte SHA-256 des pixels d'une page décodée (avec son mode et ses dimensions)"""
+    digest = hashlib.sha256(f"{img.mode}:{img.width}x{img.height}:".encode('ascii'))
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def page_spreads(sizes, right_to_left=False, parts=None):
+    """Place de chaque page dans une double page, dans le sens de lecture
+
+    La couverture et les pages en paysage (doubles pages déjà assemblées)
+    sont centrées et seules ; les autres alternent gauche puis droite, ou
+    droite puis gauche pour un livre qui se lit de droite à gauche (manga).
+    Les deux moitiés d'une double page coupée (parts, voir plan_spreads)
+    gardent leur côté, pour être réunies dans la même double page du lecteur.
+    """
+    first, second = ('right', 'left') if right_to_left else ('left', 'right')
+    parts = parts or [None] * len(sizes)
+    spreads = []
+    side = first
+    for i, (size, part) in enumerate(zip(sizes, parts)):
+        if part is not None:
+            spreads.append(f"page-spread-{part}")
+            # La page suivante ouvre une nouvelle double page, sauf si la seconde moitié manque
+            side = second if part == first else first
+        elif i == 0 or (size is not None and is_spread(size)):
+            spreads.append('rendition:page-spread-center')
+            side = first
+        else:
+            spreads.append(f"page-spread-{side}")
+            side = second if side == first else first
+    return spreads
+
+
+def source_size(reader, path):
+    """Dimensions d'une source lues dans son en-tête, sans la décoder (None si illisible)"""
+    try:
+        with reader.open(path) as f, Image.open(f) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def draft_size(size, region_size, target, autocrop=False):
+    """Taille à demander au décodeur pour que la zone utile de la page garde au moins la taille cible
+
+    La zone utile est une moitié de double page, éventuellement rognée
+    ensuite : le décodage à échelle réduite garde de quoi rogner jusqu'à
+    MAX_CROP de chaque dimension sans descendre sous la cible.
+    """
+    scale = max(target[0] / region_size[0], target[1] / region_size[1])
+    if autocrop:
+        scale /= 1 - MAX_CROP
+    if scale >= 1:
+        return size
+    return (math.ceil(size[0] * scale), math.ceil(size[1] * scale))
+
+
+def available_codecs():
+    """Codecs utilisables avec le Pillow installé (WebP, AVIF et JPEG XL dépendent de sa compilation)"""
+    Image.init()
+    return [name for name, codec in CODECS.items() if codec.format in Image.SAVE]
+
+
+def is_grayscale(img, tolerance=GRAYSCALE_TOLERANCE):
+    """Vrai si une page RGB n'a pas de couleur (scan noir et blanc enregistré en RGB)
+
+    Le test se fait sur une copie réduite en YCbCr : la réduction moyenne le
+    bruit de compression, et il suffit que Cb et Cr restent autour de 128.
+    """
+    if img.mode != 'RGB':
+        return False
+    factor = max(1, max(img.size) // GRAYSCALE_PROBE_SIZE)
+    probe = img.reduce(factor) if factor > 1 else img
+    _, cb, cr = probe.convert('YCbCr').getextrema()
+    return all(128 - tolerance <= low and high <= 128 + tolerance for low, high in (cb, cr))
+
+
+def save_page(img, codec, quality):
+    buffer = io.BytesIO()
+    img.save(buffer, codec.format, quality=quality, **codec.options)
+    return buffer.getvalue()
+
+
+def encode_image(img, codec, quality, target_bytes=None):
+    """Encoder une page ; avec une taille cible, chercher par dichotomie la meilleure qualité qui y tient"""
+    data = save_page(img, codec, quality)
+    if not target_bytes or codec.options.get('lossless') or len(data) <= target_bytes:
+        return data
+
+    low, high = MIN_QUALITY, quality - 1
+    best = None
+    while low <= high:
+        middle = (low + high) // 2
+        data = save_page(img, codec, middle)
+        if len(data) <= target_bytes:
+            best, low = data, middle + 1
+        else:
+            high = middle - 1
+    # Si même la qualité minimale dépasse la cible, le dernier essai est celui à la qualité minimale
+    return best if best is not None else data
+
+
+def encode_page(data, passthrough=True, quality=JPEG_QUALITY, target_box=None, resample='lanczos',
+                codec=DEFAULT_CODEC, grayscale=True, target_bytes=None, autocrop=False, deskew=False, part=None,
+                pixels_dir=None, pixels=None):
+    """Décoder, convertir et encoder une page (exécuté dans un processus du pool)
+
+    Reçoit les octets du fichier source. part ('left' ou 'right') ne garde
+    qu'une moitié d'une double page ; deskew redresse la page et autocrop
+    rogne ses marges uniformes (voir preprocess.py). Si une boîte cible est
+    donnée, les pages plus grandes y sont ensuite réduites ; les pages RGB
+    sans couleur sont enregistrées en niveaux de gris si grayscale est vrai.
+
+    Si pixels_dir (marques du magasin, voir PageCache.pixels_dir) est donné,
+    l'empreinte des pixels est calculée après le décodage ; si la page est
+    déjà dans le magasin, elle n'est pas encodée : le résultat, sans octets,
+    porte l'action PAGE_SIMILAR et l'empreinte. Une empreinte déjà calculée
+    (pixels) est reprise telle quelle, sans nouvelle recherche.
+
+    Retourne les octets de la page,
+    l'action effectuée (copiée ou réencodée), la durée de chaque étape en
+    secondes (décodage, conversion, encodage), le processus et l'heure de début.
+    """
+    timings = {'decode': 0.0, 'convert': 0.0, 'encode': 0.0}
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        img = Image.open(io.BytesIO(data))
+    except UnidentifiedImageError:
+        raise ValueError("format d'image non reconnu") from None
+
+    with img:
+        region = part_box(img.size, part)
+        region_size = (region[2] - region[0], region[3] - region[1])
+        target = fitted_size(region_size, target_box) if target_box else region_size
+        preprocess = autocrop or deskew
+        # Une source plus lourde que la taille cible doit être réencodée pour y tenir
+        copyable = (passthrough and part is None and target == img.size
+                    and (not target_bytes or len(data) <= target_bytes) and can_pass_through(img, data))
+
+        # Les JPEG déjà compatibles sont copiés sans décodage ni perte de qualité
+        if copyable and not preprocess:
+            timings['decode'] = time.perf_counter() - start
+            return PageResult(data, PAGE_COPIED, timings, os.getpid(), started)
+
+        decode(img, draft_size(img.size, region_size, target, autocrop))
+        decoded = time.perf_counter()
+        timings['decode'] = decoded - start
+
+        if part is not None:
+            # La boîte est recalculée : le décodage à échelle réduite a pu changer la taille
+            img = img.crop(part_box(img.size, part))
+        img = convert_to_rgb(img)
+        if pixels_dir is not None and pixels is None:
+            pixels = pixel_digest(img)
+            if os.path.exists(os.path.join(pixels_dir, pixels)):
+                timings['convert'] = time.perf_counter() - decoded
+                return PageResult(None, PAGE_SIMILAR, timings, os.getpid(), started, pixels)
+        if preprocess:
+            img, changed = straighten_and_trim(img, autocrop, deskew)
+            if copyable and not changed:
+                # Ni marge à rogner ni inclinaison : la page d'origine est copiée telle quelle
+                timings['convert'] = time.perf_counter() - decoded
+                return PageResult(data, PAGE_COPIED, timings, os.getpid(), started)
+            target = fitted_size(img.size, target_box) if target_box else img.size
+
+        if target != img.size:
+            img = downscale(img, target, resample)
+        if grayscale and is_grayscale(img):
+            img = img.convert('L')
+        converted = time.perf_counter()
+        timings['convert'] = converted - decoded
+
+        encoded = encode_image(img, CODECS[codec], quality, target_bytes)
+        timings['encode'] = time.perf_counter() - converted
+    return PageResult(encoded, PAGE_TRANSCODED, timings, os.getpid(), started, pixels)
+
+
+def same_file_key(path):
+    return os.path.normcase(os.path.realpath(path))
+
+
+def output_path_for(output_folder, filename, output_format, use_separate_folder, sources=()):
+    """Déterminer le chemin de sortie, dans le sous-dossier CBZ_Converted/EPUB_Converted si demandé
+
+    Le dossier n'est pas créé ici (voir BookConverter.convert) : un livre
+    retiré de la file avant son démarrage ne laisse pas de dossier vide.
+    Une sortie qui remplacerait l'une des sources (tome1.cbz converti dans
+    son propre dossier) reçoit le suffixe CONVERTED_SUFFIX.
+    """
+    if use_separate_folder:
+        output_folder = os.path.join(output_folder, f"{output_format.upper()}_Converted")
+    output_path = os.path.join(output_folder, f"{filename}.{output_format}")
+    if same_file_key(output_path) in {same_file_key(source_file(path)) for path in sources}:
+        output_path = os.path.join(output_folder, f"{filename}{CONVERTED_SUFFIX}.{output_format}")
+    return output_path
+
+
+def create_page_executor(max_workers=None):
+    """Créer un pool de processus pour l'encodage des pages
+
+    Les processus sont lancés en mode « spawn » : un fork depuis un programme
+    multi-thread (threads Qt, étapes du pipeline) peut hériter d'un verrou
+    tenu par un autre thread et bloquer le processus fils.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def _ignore(*args):
+    pass
+
+
+class BookConverter:
+    """Convertir une liste d'images en un fichier CBZ ou EPUB
+
+    Les notifications passent par les fonctions de rappel on_progress, on_status,
+    on_result, on_page_report, on_timings, on_cache_stats, on_stages et
+    on_page_timing, que l'interface Qt relie à ses signaux et la ligne de
+    commande à la console. Les mesures par page (on_page_timing et le fichier
+    de trace) ne sont calculées que si l'un des deux est utilisé.
+
+    L'archive est écrite dans <sortie>.part puis renommée à la fin : une
+    conversion arrêtée ou interrompue par un plantage reprend, si resume est
+    vrai, après la dernière page notée dans le journal (voir journal.py).
+    """
+
+    def __init__(self, png_paths, filename, output_folder, use_separate_folder, output_format,
+                 max_workers=None, passthrough=True, deflate_level=DEFAULT_DEFLATE_LEVEL, executor=None,
+                 cache=None, profile=DEFAULT_PROFILE, quality=None, max_in_flight=None,
+                 memory_budget=DEFAULT_MEMORY_BUDGET, tracer=None, resume=True, codec=DEFAULT_CODEC,
+                 grayscale=True, target_bytes=None, autocrop=False, deskew=False, split_spreads=False,
+                 right_to_left=False):
+        self.png_paths = png_paths
+        # Moitié de double page à garder pour chaque page (None : page entière), voir plan_spreads
+        self.page_parts = [None] * len(png_paths)
+        self.filename = filename
+        self.output_folder = output_folder
+        self.use_separate_folder = use_separate_folder
+        self.output_format = output_format.lower()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.codec_name = codec
+        self.codec = CODECS[codec]
+        # Copier un JPEG source n'a de sens que si les pages sont en JPEG de base
+        self.passthrough = passthrough and codec == 'jpeg'
+        self.grayscale = grayscale
+        self.target_bytes = target_bytes
+        self.autocrop = autocrop
+        self.deskew = deskew
+        self.split_spreads = split_spreads
+        self.right_to_left = right_to_left
+        self.deflate_level = deflate_level
+        self.executor = executor
+        self.cache = cache
+        self.profile = PROFILES[profile]
+        self.quality = quality or self.codec.quality or self.profile.quality
+        self.max_in_flight = max_in_flight or 2 * self.max_workers
+        self.queue_size = self.max_in_flight
+        self.memory_budget = memory_budget
+        self.budget_lock = threading.Lock()
+        self.in_flight = 0
+        self.in_flight_bytes = 0
+        self.write_error = None
+        self.tracer = tracer
+        self.trace_pages = False
+        self.resume = resume
+        self.journal = None
+        self.restored_pages = {}
+        self.restored_names = set()
+        self.restored_sizes = {}
+        self.page_sizes = {}
+        # Image de chaque page dans l'archive et page déjà écrite pour chaque contenu (EPUB)
+        self.page_images = {}
+        self.image_digests = {}
+        self.output_path = None
+        self.page_report = []
+        self.timings = {'decode': 0.0, 'convert': 0.0, 'encode': 0.0, 'write': 0.0}
+        self.cache_stats = {'hits': 0, 'similar': 0, 'misses': 0, 'bytes_saved': 0, 'duplicates': 0,
+                            'duplicate_bytes': 0}
+        self.is_running = True
+
+        self.on_progress = _ignore
+        self.on_status = _ignore
+        self.on_result = _ignore
+        self.on_page_report = _ignore
+        self.on_timings = _ignore
+        self.on_cache_stats = _ignore
+        self.on_stages = _ignore
+        self.on_page_timing = _ignore
+
+    def convert(self):
+        """Lancer la conversion ; retourne True si l'archive a été créée"""
+        try:
+            self.output_path = output_path_for(
+                self.output_folder, self.filename, self.output_format, self.use_separate_folder, self.png_paths)
+
+            if self.output_format not in ('cbz', 'epub'):
+                raise ValueError(f"Format de sortie inconnu : {self.output_format}")
+            if self.codec_name not in available_codecs():
+                raise ValueError(f"Le codec {self.codec.label} n'est pas disponible avec ce Pillow")
+
+            self.on_status(f"Création du {self.output_format.upper()} : {self.filename}")
+            if self.split_spreads:
+                self.plan_spreads()
+            if not self.png_paths:
+                # Dossier ou archive sans image : pas d'archive vide (ni de couverture absente dans l'OPF)
+                raise ValueError("Aucune page à convertir")
+
+            os.makedirs(os.path.dirname(self.output_path) or '.', exist_ok=True)
+            self.journal = ConversionJournal(self.output_path, self.journal_header())
+            try:
+                if self.output_format == 'cbz':
+                    self.create_cbz()
+                else:
+                    self.create_epub()
+                if self.is_running:
+                    self.journal.commit()
+            except Exception:
+                if not self.page_images:
+                    # Aucune page écrite : rien à reprendre, l'archive temporaire et le journal sont supprimés
+                    self.journal.discard()
+                raise
+            finally:
+                self.journal.close()
+
+            if self.is_running:
+                self.on_progress(100)
+                self.on_page_report(self.page_report)
+                self.on_timings(self.timings)
+                if self.cache is not None or self.cache_stats['duplicates']:
+                    self.on_cache_stats(self.cache_stats)
+                self.on_result(os.path.basename(self.output_path), True)
+                self.on_status("Conversion terminée !")
+                return True
+
+        except Exception as e:
+            self.on_result(f"Erreur générale: {str(e)}", False)
+            self.on_status("Erreur lors de la conversion !")
+
+        return False
+
+    def plan_spreads(self):
+        """Remplacer chaque double page (source en paysage) par ses deux moitiés, dans le sens de lecture
+
+        Seul l'en-tête des sources est lu ; les moitiés sont découpées à
+        l'encodage, chacune par son processus du pool.
+        """
+        self.on_status("Recherche des doubles pages...")
+        pages = []
+        parts = []
+        with SourceReader() as reader:
+            for png_path, part in zip(self.png_paths, self.page_parts):
+                size = source_size(reader, png_path) if part is None else None
+                halves = spread_parts(self.right_to_left) if size is not None and is_spread(size) else (part,)
+                for half in halves:
+                    pages.append(png_path)
+                    parts.append(half)
+        split = len(pages) - len(self.png_paths)
+        if split:
+            self.on_status(f"{split} double(s) page(s) coupée(s) en deux")
+        self.png_paths = pages
+        self.page_parts = parts
+
+    def encode_settings(self):
+        """Réglages d'encodage qui déterminent le contenu d'une page (clé du cache)"""
+        return {
+            'codec': self.codec_name,
+            'format': self.codec.format,
+            'options': self.codec.options,
+            'quality': self.quality,
+            'target_bytes': self.target_bytes,
+            'mode': 'RGB ou L sur fond blanc',
+            'grayscale': self.grayscale,
+            'passthrough': self.passthrough,
+            'size': self.profile.size,
+            'resample': self.profile.resample,
+            'autocrop': self.autocrop,
+            'deskew': self.deskew,
+        }
+
+    def encode_args(self):
+        """Réglages passés à encode_page après les octets de la page (EncodeArgs)"""
+        return EncodeArgs(self.passthrough, self.quality, self.profile.size, self.profile.resample,
+                          self.codec_name, self.grayscale, self.target_bytes, self.autocrop, self.deskew)
+
+    def journal_header(self):
+        """Description de la conversion : un journal d'une autre conversion n'est pas repris"""
+        return {
+            'format': self.output_format,
+            'pages': self.png_paths,
+            'parts': self.page_parts,
+            'settings': self.encode_settings(),
+            'deflate_level': self.deflate_level,
+        }
+
+    @contextlib.contextmanager
+    def open_archive(self):
+        """Ouvrir l'archive temporaire, en reprenant les entrées encore valides du journal"""
+        if self.resume:
+            records = self.journal.load()
+        else:
+            # Repartir de zéro : l'archive temporaire et le journal d'une conversion interrompue sont supprimés
+            self.journal.discard()
+            records = []
+        self.restored_pages = {record['page']: record['action'] for record in records if record['page'] is not None}
+        self.restored_names = {record['name'] for record in records if record['name'] is not None}
+        self.page_images = {record['page']: record['duplicate_of'] or record['name'] for record in records
+                            if record['page'] is not None}
+        self.image_digests = {record['digest']: record['name'] for record in records if record['digest']}
+        self.restored_sizes = {record['page']: record['image_size'] for record in records
+                               if record['page'] is not None and record['image_size'] is not None}
+        if self.restored_pages:
+            self.on_status(f"Reprise de la conversion : {len(self.restored_pages)} page(s) déjà écrite(s)")
+
+        with zipfile.ZipFile(self.journal.open(records), 'w') as archive:
+            restore_entries(archive, records)
+            # Réglages d'encodage dans le commentaire de l'archive, lisible par tout outil ZIP
+            archive.comment = self.settings_metadata().encode('utf-8')
+            yield archive
+
+    def settings_metadata(self):
+        """Réglages d'encodage enregistrés dans l'archive (commentaire ZIP, et métadonnées OPF pour un EPUB)"""
+        return json.dumps({'generator': "Image to book", **self.encode_settings()}, ensure_ascii=False)
+
+    def create_cbz(self):
+        """Créer un fichier CBZ"""
+        arcnames = [f"page_{i + 1:03d}{self.codec.extension}" for i in range(len(self.png_paths))]
+
+        self.on_status("Création du fichier CBZ...")
+        with self.open_archive() as cbz:
+            self.check_pages_written(self.write_pages(cbz, arcnames, 80))
+
+    @staticmethod
+    def check_pages_written(written):
+        """Refuser un livre dont aucune page n'a pu être lue ou décodée (archive vide, OPF sans couverture)"""
+        if written is not None and not written:
+            raise ValueError("Aucune page n'a pu être convertie")
+
+    def create_epub(self):
+        """Créer un fichier EPUB"""
+        image_files = [f"page_{i + 1:03d}{self.codec.extension}" for i in range(len(self.png_paths))]
+
+        self.on_status("Création du fichier EPUB...")
+        with self.open_archive() as epub:
+            # Ajouter mimetype en premier (non compressé)
+            self.write_entry(epub, "mimetype", "application/epub+zip")
+
+            # META-INF/container.xml
+            container_xml = '''<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+    <rootfiles>
+        <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+    </rootfiles>
+</container>'''
+            self.write_entry(epub, "META-INF/container.xml", container_xml)
+
+            # Traiter les images directement dans l'archive
+            written = self.write_pages(epub, [f"OEBPS/images/{img_file}" for img_file in image_files], 80)
+            self.check_pages_written(written)
+            if written is not None:
+                # Une page en double pointe vers l'image déjà écrite
+                image_files = [self.page_images[i].rsplit('/', 1)[-1] for i in written]
+                # Dimensions relevées dans l'en-tête de chaque page à son écriture
+                sizes = [self.page_sizes.get(i) or DEFAULT_PAGE_SIZE for i in written]
+                chapters = chapter_breaks([self.png_paths[i] for i in written])
+
+                # Créer content.opf
+                self.create_epub_content_opf(epub, image_files, sizes, [self.page_parts[i] for i in written])
+
+                # Créer la table des matières (nav.xhtml, et toc.ncx pour les lecteurs EPUB 2)
+                self.create_epub_nav(epub, len(image_files), chapters)
+                self.create_epub_toc_ncx(epub, chapters)
+
+                # Créer les pages XHTML
+                self.create_epub_pages(epub, image_files, sizes)
+                self.on_progress(90)
+
+    def read_stage(self, read_queue):
+        """Étape de lecture : lire chaque source, estimer son coût mémoire et consulter le cache
+
+        Les pages d'archive sont lues directement dans l'archive, gardée ouverte.
+        """
+        settings = self.encode_settings()
+        with SourceReader() as reader:
+            for i, png_path in enumerate(self.png_paths):
+                if not self.is_running:
+                    return
+                part = self.page_parts[i]
+
+                if i in self.restored_pages:
+                    # Page déjà écrite dans l'archive reprise : ni lecture ni encodage
+                    task = PageTask(i, None, 0, 0, None, None, None, time.time(), 0.0, self.restored_pages[i])
+                else:
+                    # Les deux moitiés d'une double page ont la même source, mais pas le même résultat
+                    task = self.read_page(reader, i, png_path, dict(settings, part=part) if part else settings)
+
+                # File bornée : la lecture attend que les étapes suivantes avancent
+                while self.is_running:
+                    try:
+                        read_queue.put(task, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+
+    def read_page(self, reader, i, png_path, settings):
+        read_started = time.time()
+        start = time.perf_counter()
+        task = PageTask(i, None, 0, 0, None, None, None, read_started, 0.0, None)
+        try:
+            data = reader.read(png_path)
+        except Exception as e:
+            task = task._replace(error=e)
+        else:
+            task = task._replace(data=data, size=len(data), cost=estimate_page_memory(data, self.profile.size))
+            if self.cache is not None:
+                key = PageCache.key(hashlib.sha256(data).hexdigest(), settings)
+                task = task._replace(cache_key=key, cached=self.cache.get(key))
+        return task._replace(read=time.perf_counter() - start)
+
+    def write_stage(self, archive, arcnames, write_queue, written):
+        """Étape d'écriture : écrire les pages dans l'ordre et libérer leur budget mémoire"""
+        while True:
+            item = write_queue.get()
+            if item is None:
+                return
+            task, result = item
+            try:
+                if result is not None and task.restored is not None:
+                    self.page_sizes[task.index] = self.restored_sizes.get(task.index)
+                    written.append(task.index)
+                    self.page_report.append((task.index + 1, self.png_paths[task.index], result.action))
+                elif result is not None:
+                    for stage, duration in result.timings.items():
+                        self.timings[stage] += duration
+                    write_started = time.time()
+                    write_duration = self.write_page(archive, arcnames[task.index], task.index, result)
+                    written.append(task.index)
+                    self.page_report.append((task.index + 1, self.png_paths[task.index], result.action))
+                    if self.trace_pages:
+                        self.trace_page(task, result, write_started, write_duration)
+            except Exception as e:
+                self.write_error = e
+                self.is_running = False
+            finally:
+                with self.budget_lock:
+                    self.in_flight -= 1
+                    self.in_flight_bytes -= task.cost
+
+    def write_page(self, archive, arcname, index, result):
+        """Écrire l'image d'une page ; dans un EPUB, une page identique à une image déjà écrite n'est pas réécrite
+
+        Retourne la durée d'écriture.
+        """
+        if self.output_format != 'epub':
+            self.page_images[index] = arcname
+            return self.write_entry(archive, arcname, result.data, index, result.action)
+
+        # Seul l'EPUB à mise en page fixe a besoin des dimensions des pages
+        size = self.page_sizes[index] = image_size(result.data)
+        digest = hashlib.sha256(result.data).hexdigest()
+        image = self.image_digests.get(digest)
+        if image is not None:
+            # Page en double (crédits, page blanche...) : sa page XHTML pointera vers l'image du manifeste
+            self.page_images[index] = image
+            self.journal.record_duplicate(image, archive.fp.tell(), index, result.action, self.png_paths[index], size)
+            self.cache_stats['duplicates'] += 1
+            self.cache_stats['duplicate_bytes'] += len(result.data)
+            return 0.0
+        self.page_images[index] = arcname
+        self.image_digests[digest] = arcname
+        return self.write_entry(archive, arcname, result.data, index, result.action, size, digest)
+
+    def trace_page(self, task, result, write_started, write_duration):
+        """Publier les durées et volumes d'une page écrite (signal structuré et fichier de trace)"""
+        event = {
+            'book': self.filename,
+            'page': task.index + 1,
+            'source': self.png_paths[task.index],
+            'action': result.action,
+            'bytes_in': task.size,
+            'bytes_out': len(result.data),
+            'read': task.read,
+            'decode': result.timings.get('decode', 0.0),
+            'convert': result.timings.get('convert', 0.0),
+            'encode': result.timings.get('encode', 0.0),
+            'write': write_duration,
+            'pid': result.pid,
+            'started': {'read': task.read_started, 'write': write_started},
+        }
+        # Les étapes du pool s'enchaînent à partir du début du traitement dans le processus
+        if result.started is not None:
+            started = result.started
+            for stage in ('decode', 'convert', 'encode'):
+                event['started'][stage] = started
+                started += event[stage]
+
+        self.on_page_timing(event)
+        if self.tracer is not None:
+            self.tracer.record(event)
+
+    def stage_depths(self, read_queue, futures, results, write_queue):
+        """Profondeur de chaque étape du pipeline, pour le réglage"""
+        return {
+            'read': read_queue.qsize(),
+            'encode': len(futures),
+            'reorder': len(results),
+            'write': write_queue.qsize(),
+            'in_flight': self.in_flight,
+            'memory': self.in_flight_bytes,
+        }
+
+    def write_pages(self, archive, arcnames, progress_span):
+        """Encoder les pages et les écrire directement dans l'archive, dans un pipeline borné
+
+        lecture (thread) → décodage/conversion/encodage (pool de processus) → écriture (thread).
+        Chaque étape communique par une file bornée ; au plus max_in_flight pages,
+        et au plus memory_budget octets estimés, sont en cours entre la lecture et
+        l'écriture. Les pages déjà présentes dans le cache ne sont pas réencodées.
+        Chaque page écrite est ajoutée au rapport (copiée, réencodée ou en cache).
+        Retourne les indices des pages écrites, ou None si la conversion a été interrompue.
+        """
+        total_images = len(self.png_paths)
+        read_queue = queue.Queue(maxsize=self.queue_size)
+        write_queue = queue.Queue(maxsize=self.queue_size)
+        futures = {}
+        results = {}
+        written = []
+        pending = None
+        next_write = 0
+        done = 0
+        reported_done = -1
+        last_report = 0.0
+
+        self.in_flight = 0
+        self.in_flight_bytes = 0
+        self.write_error = None
+        self.trace_pages = self.tracer is not None or self.on_page_timing is not _ignore
+        # Pages du magasin comparables : encodées avec les mêmes réglages (moitié de double page comprise)
+        settings_id = PageCache.settings_id(self.encode_settings()) if self.cache is not None else None
+        pixels_dir = self.cache.pixels_dir(settings_id) if self.cache is not None else None
+
+        reader = threading.Thread(target=self.read_stage, args=(read_queue,), daemon=True)
+        writer = threading.Thread(target=self.write_stage, args=(archive, arcnames, write_queue, written),
+                                  daemon=True)
+        reader.start()
+        writer.start()
+
+        try:
+            with self.page_executor() as executor:
+                while next_write < total_images and self.is_running:
+                    # Admettre les pages lues tant que le nombre de pages et le budget mémoire le permettent
+                    while True:
+                        if pending is None:
+                            try:
+                                pending = read_queue.get(timeout=0.05 if not futures else 0)
+                            except queue.Empty:
+                                break
+                        with self.budget_lock:
+                            if self.in_flight and (self.in_flight >= self.max_in_flight or
+                                                   self.in_flight_bytes + pending.cost > self.memory_budget):
+                                break
+                            self.in_flight += 1
+                            self.in_flight_bytes += pending.cost
+
+                        task, pending = pending, None
+                        if task.error is not None:
+                            results[task.index] = (task, None)
+                            self.on_result(
+                                f"Erreur avec {os.path.basename(self.png_paths[task.index])}: {str(task.error)}",
+                                False)
+                            done += 1
+                        elif task.restored is not None:
+                            results[task.index] = (task, PageResult(None, task.restored, {}, None, None))
+                            done += 1
+                        elif task.cached is not None:
+                            self.cache_stats['hits'] += 1
+                            self.cache_stats['bytes_saved'] += len(task.cached)
+                            results[task.index] = (task, PageResult(task.cached, PAGE_CACHED, {}, None, None))
+                            done += 1
+                        else:
+                            future = executor.submit(encode_page, task.data, *self.encode_args(),
+                                                     self.page_parts[task.index], pixels_dir)
+                            # Les octets source ne sont plus utiles une fois transmis au pool, sauf s'il
+                            # faut encoder une page dont la marque survit à la page évincée du magasin
+                            futures[future] = task if pixels_dir else task._replace(data=None)
+
+                    finished, _ = wait(futures, timeout=0.05, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        task = futures.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = None
+                            self.on_result(
+                                f"Erreur avec {os.path.basename(self.png_paths[task.index])}: {str(e)}", False)
+                        else:
+                            if result.action == PAGE_SIMILAR:
+                                data = self.cache.get_similar(task.cache_key, settings_id, result.pixels)
+                                if data is None:
+                                    # Page évincée entre-temps : l'encoder, avec l'empreinte déjà calculée
+                                    future = executor.submit(encode_page, task.data, *self.encode_args(),
+                                                             self.page_parts[task.index], None, result.pixels)
+                                    futures[future] = task._replace(data=None)
+                                    continue
+                                self.cache_stats['similar'] += 1
+                                self.cache_stats['bytes_saved'] += len(data)
+                                result = result._replace(data=data)
+                            # Seules les pages réencodées valent la peine d'être mises en cache
+                            elif task.cache_key and result.action == PAGE_TRANSCODED:
+                                self.cache.put(task.cache_key, result.data, settings_id, result.pixels)
+                                self.cache_stats['misses'] += 1
+                        results[task.index] = (task, result)
+                        # La progression compte les pages terminées, pas les pages soumises
+                        done += 1
+
+                    if done != reported_done:
+                        reported_done = done
+                        self.on_progress(int((done / total_images) * progress_span))
+
+                    # Transmettre dans l'ordre toutes les pages consécutives disponibles à l'écriture
+                    while next_write in results and self.is_running:
+                        try:
+                            write_queue.put(results[next_write], timeout=0.1)
+                        except queue.Full:
+                            continue
+                        del results[next_write]
+                        next_write += 1
+
+                    now = time.perf_counter()
+                    if now - last_report >= STAGE_REPORT_INTERVAL:
+                        last_report = now
+                        self.on_stages(self.stage_depths(read_queue, futures, results, write_queue))
+
+                if not self.is_running:
+                    for future in futures:
+                        future.cancel()
+        except BaseException:
+            # Arrêter aussi la lecture, qui pourrait attendre indéfiniment une place dans sa file
+            self.is_running = False
+            raise
+        finally:
+            write_queue.put(None)
+            writer.join()
+            reader.join()
+
+        if self.write_error is not None:
+            raise self.write_error
+        if not self.is_running:
+            return None
+        return written
+
+    def write_entry(self, archive, arcname, data, page=None, action=None, size=None, digest=None):
+        """Écrire une entrée dans l'archive selon la politique de compression et la noter au journal
+
+        Les entrées reprises d'une conversion interrompue ne sont pas réécrites.
+        Retourne la durée d'écriture.
+        """
+        if arcname in self.restored_names:
+            return 0.0
+        compress_type, compresslevel = compression_for(arcname, self.deflate_level)
+        start = time.perf_counter()
+        archive.writestr(arcname, data, compress_type, compresslevel)
+        self.journal.record(archive.getinfo(arcname), archive.fp.tell(), page, action,
+                            self.png_paths[page] if page is not None else None, size, digest)
+        duration = time.perf_counter() - start
+        self.timings['write'] += duration
+        return duration
+
+    def book_identifier(self):
+        # Identifiant stable d'un livre à l'autre : dérivé de son nom
+        return f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, self.filename)}"
+
+    def create_epub_content_opf(self, epub, image_files, sizes, parts=None):
+        """Créer le fichier content.opf (EPUB 3 à mise en page fixe)"""
+        manifest_items = []
+        spine_items = []
+        # Une image partagée par plusieurs pages n'apparaît qu'une fois dans le manifeste
+        image_ids = {}
+
+        for i, (img_file, spread) in enumerate(zip(image_files, page_spreads(sizes, self.right_to_left, parts))):
+            page_id = f"page_{i + 1:03d}"
+            manifest_items.append(
+                f'    <item id="{page_id}" href="pages/{page_id}.xhtml" media-type="application/xhtml+xml"/>')
+            if img_file not in image_ids:
+                image_ids[img_file] = f"img_{len(image_ids) + 1:03d}"
+                cover = ' properties="cover-image"' if i == 0 else ''
+                manifest_items.append(f'    <item id="{image_ids[img_file]}" href="images/{img_file}" '
+                                      f'media-type="{self.codec.media_type}"{cover}/>')
+            spine_items.append(f'    <itemref idref="{page_id}" properties="{spread}"/>')
+        settings = escape(self.settings_metadata(), {'"': '&quot;'})
+        modified = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+        # Mise en page fixe : chaque page a la taille de son image, le lecteur n'a rien à recomposer
+        content_opf = f'''<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" unique-identifier="BookId" version="3.0"
+         prefix="rendition: http://www.idpf.org/vocab/rendition/#">
+    <metadata xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:opf="http://www.idpf.org/2007/opf">
+        <dc:title>{escape(self.filename)}</dc:title>
+        <dc:creator>Image Converter</dc:creator>
+        <dc:identifier id="BookId">{self.book_identifier()}</dc:identifier>
+        <dc:language>fr</dc:language>
+        <meta property="dcterms:modified">{modified}</meta>
+        <meta property="rendition:layout">pre-paginated</meta>
+        <meta property="rendition:orientation">auto</meta>
+        <meta property="rendition:spread">landscape</meta>
+        <meta name="cover" content="img_001"/>
+        <meta name="image-to-book:settings" content="{settings}"/>
+    </metadata>
+    <manifest>
+        <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+        <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+{chr(10).join(manifest_items)}
+    </manifest>
+    <spine toc="ncx" page-progression-direction="{'rtl' if self.right_to_left else 'ltr'}">
+{chr(10).join(spine_items)}
+    </spine>
+</package>'''
+
+        self.write_entry(epub, "OEBPS/content.opf", content_opf)
+
+    def create_epub_nav(self, epub, page_count, chapters):
+        """Créer le document de navigation EPUB 3 : chapitres, liste des pages et couverture"""
+        toc_items = "\n".join(
+            f'            <li><a href="pages/page_{start + 1:03d}.xhtml">{escape(title)}</a></li>'
+            for start, title in chapters)
+        page_items = "\n".join(
+            f'            <li><a href="pages/page_{i + 1:03d}.xhtml">{i + 1}</a></li>' for i in range(page_count))
+
+        nav = f'''<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="fr" lang="fr">
+<head>
+    <title>{escape(self.filename)}</title>
+</head>
+<body>
+    <nav epub:type="toc" id="toc">
+        <h1>Sommaire</h1>
+        <ol>
+{toc_items}
+        </ol>
+    </nav>
+    <nav epub:type="page-list" hidden="">
+        <ol>
+{page_items}
+        </ol>
+    </nav>
+    <nav epub:type="landmarks" hidden="">
+        <ol>
+            <li><a epub:type="cover" href="pages/page_001.xhtml">Couverture</a></li>
+        </ol>
+    </nav>
+</body>
+</html>'''
+
+        self.write_entry(epub, "OEBPS/nav.xhtml", nav)
+
+    def create_epub_toc_ncx(self, epub, chapters):
+        """Créer le fichier toc.ncx pour EPUB (une entrée par chapitre)"""
+        nav_points = "\n".join(f'''        <navPoint id="navpoint-{number}" playOrder="{number}">
+            <navLabel>
+                <text>{escape(title)}</text>
+            </navLabel>
+            <content src="pages/page_{start + 1:03d}.xhtml"/>
+        </navPoint>''' for number, (start, title) in enumerate(chapters, 1))
+
+        toc_ncx = f'''<?xml version="1.0" encoding="UTF-8"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+    <head>
+        <meta name="dtb:uid" content="{self.book_identifier()}"/>
+        <meta name="dtb:depth" content="1"/>
+        <meta name="dtb:totalPageCount" content="0"/>
+        <meta name="dtb:maxPageNumber" content="0"/>
+    </head>
+    <docTitle>
+        <text>{escape(self.filename)}</text>
+    </docTitle>
+    <navMap>
+{nav_points}
+    </navMap>
+</ncx>'''
+
+        self.write_entry(epub, "OEBPS/toc.ncx", toc_ncx)
+
+    def create_epub_pages(self, epub, image_files, sizes):
+        """Créer les pages XHTML pour EPUB, chacune à la taille en pixels de son image"""
+        for i, (img_file, (width, height)) in enumerate(zip(image_files, sizes)):
+            if not self.is_running:
+                return
+
+            page_content = f'''<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head>
+    <title>Page {i + 1}</title>
+    <meta name="viewport" content="width={width}, height={height}"/>
+    <style type="text/css">
+        html, body {{ margin: 0; padding: 0; width: {width}px; height: {height}px; }}
+        img {{ display: block; width: {width}px; height: {height}px; }}
+    </style>
+</head>
+<body>
+    <img src="../images/{img_file}" alt="Page {i + 1}"/>
+</body>
+</html>'''
+
+            page_filename = f"page_{i + 1:03d}.xhtml"
+            self.write_entry(epub, f"OEBPS/pages/{page_filename}", page_content)
+
+    def page_executor(self):
+        """Retourner le pool de processus pour l'encodage des pages
+
+        Un pool partagé (fourni à la construction) n'est pas arrêté à la fin de la conversion.
+        """
+        if self.executor is not None:
+            return contextlib.nullcontext(self.executor)
+        return create_page_executor(self.max_workers)
+
+    def stop(self):
+        self.is_running = False
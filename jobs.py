@@ -0,0 +1,246 @@
+"""File de conversion de l'interface : plusieurs livres convertis en même temps sur un pool de processus partagé
+
+converter (et Pillow) n'est importé qu'à l'ajout du premier livre : la file
+est créée au démarrage de l'interface sans le charger.
+"""
+import os
+import time
+import itertools
+from collections import deque
+
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+
+JOB_PENDING = "en attente"
+JOB_RUNNING = "en cours"
+JOB_DONE = "terminé"
+JOB_FAILED = "échec"
+JOB_CANCELLED = "annulé"
+DEFAULT_MAX_BOOKS = 2
+
+
+class ImageConverterWorker(QThread):
+    progress_signal = pyqtSignal(int)
+    status_signal = pyqtSignal(str)
+    result_signal = pyqtSignal(str, bool)
+    page_report_signal = pyqtSignal(list)
+    timing_signal = pyqtSignal(dict)
+    cache_stats_signal = pyqtSignal(dict)
+    stages_signal = pyqtSignal(dict)
+    page_timing_signal = pyqtSignal(dict)
+
+    def __init__(self, png_paths, filename, output_folder, use_separate_folder, output_format, **options):
+        super().__init__()
+        from converter import BookConverter
+        self.success = False
+        self.converter = BookConverter(
+            png_paths, filename, output_folder, use_separate_folder, output_format, **options)
+        self.converter.on_progress = self.progress_signal.emit
+        self.converter.on_status = self.status_signal.emit
+        self.converter.on_result = self.result_signal.emit
+        self.converter.on_page_report = self.page_report_signal.emit
+        self.converter.on_timings = self.timing_signal.emit
+        self.converter.on_cache_stats = self.cache_stats_signal.emit
+        self.converter.on_stages = self.stages_signal.emit
+
+    def run(self):
+        # Les mesures par page ne sont calculées que si quelqu'un les écoute
+        if self.receivers(self.page_timing_signal):
+            self.converter.on_page_timing = self.page_timing_signal.emit
+        try:
+            self.success = self.converter.convert()
+        finally:
+            if self.converter.tracer is not None:
+                self.converter.tracer.close()
+
+    def stop(self):
+        self.converter.stop()
+
+
+class ConversionJob:
+    """Un livre de la file : ce qu'il faut convertir, son état et son avancement"""
+
+    def __init__(self, job_id, name, pages, output_format, output_folder, use_separate_folder, options):
+        from converter import output_path_for
+        self.id = job_id
+        self.name = name
+        self.pages = pages
+        self.output_format = output_format
+        self.output_folder = output_folder
+        self.use_separate_folder = use_separate_folder
+        self.options = options
+        self.output_path = output_path_for(output_folder, name, output_format.lower(), use_separate_folder, pages)
+        self.state = JOB_PENDING
+        self.progress = 0
+        self.worker = None
+        self.period = None
+        self.cancel_requested = False
+        self.started = None
+        self.finished = None
+        self.size = 0
+
+    def page_count(self):
+        # Les doubles pages coupées en deux ajoutent des pages au démarrage de la conversion
+        return len(self.worker.converter.png_paths) if self.worker is not None else len(self.pages)
+
+    def pages_written(self):
+        # Lu depuis le thread de l'interface : la longueur d'une liste se lit sans verrou
+        return len(self.worker.converter.page_report) if self.worker is not None else 0
+
+    def close_tracer(self):
+        # Un livre annulé avant son démarrage n'a pas de worker pour fermer sa trace
+        tracer = self.options.get('tracer')
+        if tracer is not None:
+            tracer.close()
+
+
+class JobQueue(QObject):
+    """File des livres à convertir, plusieurs à la fois sur un pool de processus partagé
+
+    Au plus max_books livres sont convertis en même temps ; leurs pages sont
+    encodées par le même pool de max_workers processus, créé au démarrage du
+    premier livre et arrêté quand la file est vide. Un livre en attente peut
+    être retiré ; un livre en cours est arrêté et pourra être repris grâce à
+    son journal.
+    """
+
+    job_added = pyqtSignal(int)
+    job_started = pyqtSignal(int)
+    job_progress = pyqtSignal(int, int)
+    job_finished = pyqtSignal(int)
+    active_changed = pyqtSignal(bool)
+
+    def __init__(self, max_books=DEFAULT_MAX_BOOKS, max_workers=None, parent=None):
+        super().__init__(parent)
+        self.max_books = max_books
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.jobs = {}
+        self.pending = deque()
+        self.running = set()
+        self.ids = itertools.count(1)
+        self.executor = None
+        # Période d'activité : du démarrage du premier livre jusqu'à ce que la file soit vide
+        self.period = 0
+        self.period_started = None
+        self.last_sample = None
+
+    def set_limits(self, max_books, max_workers):
+        """Changer le nombre de livres simultanés (immédiat) et de processus (au prochain pool)"""
+        self.max_books = max_books
+        self.max_workers = max_workers
+        self.schedule()
+
+    def add_job(self, name, pages, output_format, output_folder, use_separate_folder, **options):
+        """Mettre un livre en file ; les options sont celles de BookConverter"""
+        job = ConversionJob(next(self.ids), name, pages, output_format, output_folder, use_separate_folder, options)
+        # Deux livres vers la même sortie partageraient l'archive temporaire et le journal
+        if any(other.output_path == job.output_path for other in self.active_jobs()):
+            raise ValueError(f"« {os.path.basename(job.output_path)} » est déjà dans la file")
+        self.jobs[job.id] = job
+        self.pending.append(job.id)
+        self.job_added.emit(job.id)
+        self.schedule()
+        return job.id
+
+    def active_jobs(self):
+        return [self.jobs[job_id] for job_id in itertools.chain(self.pending, self.running)]
+
+    def is_active(self):
+        return bool(self.pending or self.running)
+
+    def schedule(self):
+        """Démarrer des livres en attente tant qu'il reste de la place"""
+        while self.pending and len(self.running) < self.max_books:
+            self.start_job(self.jobs[self.pending.popleft()])
+
+        if not self.running and self.executor is not None:
+            # Plus rien à convertir : libérer les processus du pool
+            self.executor.shutdown(wait=False)
+            self.executor = None
+            self.active_changed.emit(False)
+
+    def start_job(self, job):
+        if self.executor is None:
+            from converter import create_page_executor
+            self.executor = create_page_executor(self.max_workers)
+            self.period += 1
+            self.period_started = time.perf_counter()
+            self.last_sample = (self.period_started, 0)
+            self.active_changed.emit(True)
+
+        job.worker = ImageConverterWorker(
+            job.pages, job.name, job.output_folder, job.use_separate_folder, job.output_format,
+            max_workers=self.max_workers, executor=self.executor, **job.options)
+        job.worker.progress_signal.connect(lambda value, job=job: self.update_progress(job, value))
+        job.worker.finished.connect(lambda job=job: self.job_done(job))
+        job.state = JOB_RUNNING
+        job.period = self.period
+        job.started = time.perf_counter()
+        self.running.add(job.id)
+        # Émis avant le démarrage, pour que l'interface relie les signaux du worker
+        self.job_started.emit(job.id)
+        job.worker.start()
+
+    def update_progress(self, job, value):
+        job.progress = value
+        self.job_progress.emit(job.id, value)
+
+    def job_done(self, job):
+        self.running.discard(job.id)
+        job.finished = time.perf_counter()
+        if job.worker.success:
+            job.state = JOB_DONE
+            job.size = os.path.getsize(job.worker.converter.output_path)
+        else:
+            job.state = JOB_CANCELLED if job.cancel_requested else JOB_FAILED
+        self.job_finished.emit(job.id)
+        self.schedule()
+
+    def cancel(self, job_id):
+        """Retirer un livre en attente ou arrêter un livre en cours"""
+        job = self.jobs[job_id]
+        if job.state == JOB_PENDING:
+            self.pending.remove(job_id)
+            job.state = JOB_CANCELLED
+            job.close_tracer()
+            self.job_finished.emit(job_id)
+        elif job.state == JOB_RUNNING and not job.cancel_requested:
+            job.cancel_requested = True
+            job.worker.stop()
+
+    def cancel_all(self):
+        for job in self.active_jobs():
+            self.cancel(job.id)
+
+    def shutdown(self):
+        """Arrêter la file et attendre la fin des livres en cours (fermeture de la fenêtre)"""
+        self.cancel_all()
+        for job_id in list(self.running):
+            self.jobs[job_id].worker.wait()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def throughput(self):
+        """Débit de la période en cours : pages écrites, total à écrire, débit moyen et instantané"""
+        now = time.perf_counter()
+        period_jobs = [job for job in self.jobs.values() if job.period == self.period]
+        pages = sum(job.pages_written() for job in period_jobs)
+        total = pages + sum(job.page_count() - job.pages_written() for job in period_jobs
+                            if job.state == JOB_RUNNING)
+        total += sum(len(self.jobs[job_id].pages) for job_id in self.pending)
+
+        elapsed = now - self.period_started if self.period_started is not None else 0.0
+        rate = 0.0
+        if self.last_sample is not None and now > self.last_sample[0]:
+            rate = (pages - self.last_sample[1]) / (now - self.last_sample[0])
+        self.last_sample = (now, pages)
+        return {
+            'pages': pages,
+            'total_pages': total,
+            'elapsed': elapsed,
+            'pages_per_second': rate,
+            'average_pages_per_second': pages / elapsed if elapsed else 0.0,
+            'bytes': sum(job.size for job in period_jobs),
+            'running': len(self.running),
+            'pending': len(self.pending),
+        }
@@ -0,0 +1,225 @@
+"""Journal de conversion, pour reprendre un livre interrompu à la dernière entrée écrite
+
+Pendant la conversion, l'archive est écrite dans un fichier voisin
+<sortie>.part et chaque entrée terminée est notée dans <sortie>.journal (une
+ligne JSON par entrée). Au succès, l'archive est renommée atomiquement vers
+la sortie et le journal supprimé : un lecteur ou un outil de synchronisation
+ne voit jamais d'archive à moitié écrite. Après un arrêt ou un plantage, la
+conversion suivante du même livre reprend les entrées déjà écrites.
+"""
+import os
+import json
+import time
+import zlib
+import struct
+import zipfile
+
+from sources import source_file
+
+JOURNAL_VERSION = 3
+# Intervalle minimal entre deux synchronisations disque (fsync) de l'archive et du journal
+SYNC_INTERVAL = 1.0
+LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+
+def source_signature(path):
+    """Taille et date de modification d'une source (ou de son archive), pour savoir si elle a changé"""
+    stat = os.stat(source_file(path))
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def entry_is_intact(part, record):
+    """Vérifier qu'une entrée notée dans le journal est complète dans l'archive (en-tête et CRC)"""
+    part.seek(record['header_offset'])
+    header = part.read(LOCAL_HEADER.size)
+    if len(header) != LOCAL_HEADER.size:
+        return False
+    fields = LOCAL_HEADER.unpack(header)
+    if fields[0] != LOCAL_HEADER_SIGNATURE:
+        return False
+    data_start = record['header_offset'] + LOCAL_HEADER.size + fields[9] + fields[10]
+    if data_start + record['compress_size'] != record['end']:
+        return False
+
+    part.seek(data_start)
+    data = part.read(record['compress_size'])
+    if len(data) != record['compress_size']:
+        return False
+    try:
+        if record['compress_type'] == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -15)
+        elif record['compress_type'] != zipfile.ZIP_STORED:
+            return False
+    except zlib.error:
+        return False
+    return zlib.crc32(data) == record['crc']
+
+
+def restore_entries(archive, records):
+    """Réinscrire les entrées reprises dans une archive ouverte en écriture
+
+    Les données sont déjà dans le fichier : il suffit que le répertoire
+    central, écrit à la fermeture, les référence. Les pages en double n'ont
+    pas d'entrée à elles.
+    """
+    for record in records:
+        if record['duplicate_of'] is not None:
+            continue
+        zinfo = zipfile.ZipInfo(record['name'], tuple(record['date_time']))
+        zinfo.compress_type = record['compress_type']
+        zinfo.CRC = record['crc']
+        zinfo.compress_size = record['compress_size']
+        zinfo.file_size = record['file_size']
+        zinfo.header_offset = record['header_offset']
+        zinfo.external_attr = record['external_attr']
+        zinfo.flag_bits = record['flag_bits']
+        archive.filelist.append(zinfo)
+        archive.NameToInfo[zinfo.filename] = zinfo
+
+
+class ConversionJournal:
+    """Archive temporaire et journal des entrées écrites pour une sortie donnée
+
+    L'en-tête du journal décrit la conversion (format, pages, réglages) :
+    une conversion différente vers la même sortie repart de zéro.
+    """
+
+    def __init__(self, output_path, header):
+        self.output_path = output_path
+        self.part_path = f"{output_path}.part"
+        self.path = f"{output_path}.journal"
+        # Forme relue du JSON (tuples devenus listes), pour comparer à l'en-tête d'un journal existant
+        self.header = json.loads(json.dumps(dict(header, version=JOURNAL_VERSION)))
+        self.part = None
+        self.file = None
+        self.last_sync = 0.0
+
+    def load(self):
+        """Retourner les entrées réutilisables : le plus long début du journal encore intact"""
+        if not (os.path.exists(self.path) and os.path.exists(self.part_path)):
+            return []
+        with open(self.path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        try:
+            if not lines or json.loads(lines[0]) != self.header:
+                return []
+        except ValueError:
+            return []
+
+        records = []
+        names = set()
+        with open(self.part_path, 'rb') as part:
+            for line in lines[1:]:
+                try:
+                    record = json.loads(line)
+                    # Une page dont la source a changé est réencodée, ainsi que les suivantes
+                    if record['source'] is not None and source_signature(record['source_path']) != record['source']:
+                        break
+                except (ValueError, KeyError, OSError):
+                    # Dernière ligne tronquée par un plantage, ou source disparue
+                    break
+                if record['duplicate_of'] is not None:
+                    # Page en double : l'image qu'elle reprend doit faire partie des entrées reprises
+                    if record['duplicate_of'] not in names:
+                        break
+                elif not entry_is_intact(part, record):
+                    break
+                else:
+                    names.add(record['name'])
+                records.append(record)
+        return records
+
+    def open(self, records):
+        """Ouvrir l'archive temporaire après les entrées reprises et repartir d'un journal propre"""
+        if records:
+            self.part = open(self.part_path, 'r+b')
+            self.part.truncate(records[-1]['end'])
+            self.part.seek(records[-1]['end'])
+        else:
+            self.part = open(self.part_path, 'wb')
+
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.header) + '\n')
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+        os.replace(temp_path, self.path)
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.last_sync = time.monotonic()
+        return self.part
+
+    def record(self, zinfo, end, page=None, action=None, source_path=None, image_size=None, digest=None):
+        """Noter une entrée entièrement écrite dans l'archive
+
+        Pour une page d'EPUB, ses dimensions et l'empreinte de son contenu
+        sont notées aussi : une page identique écrite après la reprise
+        pointera vers cette entrée.
+        """
+        # L'entrée doit être dans le fichier avant d'apparaître dans le journal
+        self.part.flush()
+        self.write({
+            'name': zinfo.filename,
+            'date_time': list(zinfo.date_time),
+            'compress_type': zinfo.compress_type,
+            'crc': zinfo.CRC,
+            'compress_size': zinfo.compress_size,
+            'file_size': zinfo.file_size,
+            'header_offset': zinfo.header_offset,
+            'external_attr': zinfo.external_attr,
+            'flag_bits': zinfo.flag_bits,
+            'end': end,
+            'page': page,
+            'action': action,
+            'source_path': source_path,
+            'source': source_signature(source_path) if source_path else None,
+            'image_size': list(image_size) if image_size else None,
+            'digest': digest,
+            'duplicate_of': None,
+        })
+
+    def record_duplicate(self, name, end, page, action=None, source_path=None, image_size=None):
+        """Noter une page d'EPUB sans entrée propre, qui reprend l'image de l'entrée name"""
+        self.write({
+            'name': None,
+            'end': end,
+            'page': page,
+            'action': action,
+            'source_path': source_path,
+            'source': source_signature(source_path) if source_path else None,
+            'image_size': list(image_size) if image_size else None,
+            'digest': None,
+            'duplicate_of': name,
+        })
+
+    def write(self, record):
+        """Ajouter une ligne au journal ; l'archive et le journal sont synchronisés au plus une fois par SYNC_INTERVAL"""
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+        now = time.monotonic()
+        if now - self.last_sync >= SYNC_INTERVAL:
+            self.last_sync = now
+            os.fsync(self.part.fileno())
+            os.fsync(self.file.fileno())
+
+    def commit(self):
+        """Archive complète : la renommer atomiquement vers la sortie et supprimer le journal"""
+        self.part.flush()
+        os.fsync(self.part.fileno())
+        self.close()
+        os.replace(self.part_path, self.output_path)
+        os.remove(self.path)
+
+    def close(self):
+        """Fermer sans valider : l'archive temporaire et le journal restent pour une reprise"""
+        for f in (self.part, self.file):
+            if f is not None and not f.closed:
+                f.close()
+
+    def discard(self):
+        """Oublier une conversion interrompue"""
+        self.close()
+        for path in (self.part_path, self.path):
+            if os.path.exists(path):
+                os.remove(path)
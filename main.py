@@ -1,304 +1,133 @@
+import time
+
+# Début du démarrage, avant les imports (mesuré avec --startup-time)
+STARTED = time.perf_counter()
+
 import sys
 import os
-import zipfile
-import shutil
-from PIL import Image
+import multiprocessing
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QPushButton, QFileDialog, QListWidget,
-    QLabel, QProgressBar, QHBoxLayout, QCheckBox, QLineEdit, QMessageBox, QComboBox
+    QLabel, QProgressBar, QHBoxLayout, QCheckBox, QLineEdit, QMessageBox, QComboBox,
+    QSpinBox, QListWidgetItem, QListView, QAbstractItemView, QTableWidget, QTableWidgetItem, QHeaderView
 )
 from PyQt6.QtGui import QMovie
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize
+from PyQt6.QtCore import Qt, QSize, QTimer, QThread, QItemSelectionModel, pyqtSignal
 from PyQt6.QtGui import QIcon
-
-
-class ImageConverterWorker(QThread):
+# Pillow, converter et preflight ne sont importés qu'à la première miniature, conversion ou vérification
+from profiles import PROFILES, DEFAULT_PROFILE, CODECS, DEFAULT_CODEC
+from cache import PageCache, default_cache_dir
+from tracing import PageTracer
+from page_list import PageListModel, THUMBNAIL_SIZE
+from jobs import JobQueue, JOB_PENDING, JOB_RUNNING, JOB_DONE, DEFAULT_MAX_BOOKS
+from sources import expand_sources, book_name, book_pages
+
+# Filtre du dialogue d'ouverture : images isolées ou archives dont les pages sont lues sans extraction
+SOURCE_FILTER = "Images et archives (*.png *.jpg *.jpeg *.bmp *.gif *.tiff *.webp *.avif *.jxl *.cbz *.zip *.cbr *.rar *.pdf)"
+BOOK_FILTER = "Archives (*.cbz *.zip *.cbr *.rar *.pdf)"
+# Colonnes de la file des livres
+JOB_NAME_COLUMN, JOB_PAGES_COLUMN, JOB_PROGRESS_COLUMN, JOB_CANCEL_COLUMN = range(4)
+# Journal des mesures de --startup-time, dans le dossier de l'application à côté du cache
+STARTUP_LOG = "startup.log"
+IMPORTED = time.perf_counter()
+
+
+def resource_path(name):
+    """Chemin d'un fichier livré avec l'application (à côté de main.py, ou dans l'exécutable PyInstaller)"""
+    return os.path.join(getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__))), name)
+
+
+def report_startup(marks):
+    """Noter la durée de chaque étape du démarrage, depuis le début de main.py
+
+    La mesure est ajoutée au journal STARTUP_LOG : l'exécutable PyInstaller
+    n'a pas de console (sys.stdout vaut None). Elle est aussi affichée
+    quand l'application est lancée depuis un terminal.
+    """
+    steps = [f"{name} {(end - start) * 1000:.0f} ms" for (_, start), (name, end) in zip(marks, marks[1:])]
+    line = (f"Démarrage : {', '.join(steps)} — total {(marks[-1][1] - marks[0][1]) * 1000:.0f} ms "
+            f"(Pillow chargé : {'oui' if 'PIL.Image' in sys.modules else 'non'})")
+    log_path = os.path.join(os.path.dirname(default_cache_dir()), STARTUP_LOG)
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {line}\n")
+    if sys.stdout is not None:
+        print(f"{line}\nNoté dans {log_path}", flush=True)
+
+
+def clean_filename(filename):
+    return "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_')).strip()
+
+
+class PreflightWorker(QThread):
+    """Vérification préalable des pages dans un thread, pour garder l'interface réactive"""
     progress_signal = pyqtSignal(int)
-    status_signal = pyqtSignal(str)
-    result_signal = pyqtSignal(str, bool)
-    start_loading_signal = pyqtSignal()
-    stop_loading_signal = pyqtSignal()
+    report_signal = pyqtSignal(dict)
 
-    def __init__(self, png_paths, filename, output_folder, use_separate_folder, output_format):
+    def __init__(self, paths, encode_args, workers):
         super().__init__()
-        self.png_paths = png_paths
-        self.filename = filename
-        self.output_folder = output_folder
-        self.use_separate_folder = use_separate_folder
-        self.output_format = output_format.lower()
-        self.is_running = True
+        self.paths = paths
+        self.encode_args = encode_args
+        self.workers = workers
+        self.last_progress = -1
 
     def run(self):
-        self.start_loading_signal.emit()
+        from preflight import preflight
+        self.report_signal.emit(preflight(self.paths, self.encode_args, self.workers, self.report_progress))
 
-        try:
-            # Déterminer le chemin de sortie
-            folder_name = f"{self.output_format.upper()}_Converted" if self.use_separate_folder else ""
-
-            if self.use_separate_folder:
-                output_directory = os.path.join(self.output_folder, folder_name)
-                os.makedirs(output_directory, exist_ok=True)
-                output_path = os.path.join(output_directory, f"{self.filename}.{self.output_format}")
-            else:
-                output_path = os.path.join(self.output_folder, f"{self.filename}.{self.output_format}")
+    def report_progress(self, done, total):
+        # Un signal par pourcent, pas par page
+        value = done * 100 // total
+        if value != self.last_progress:
+            self.last_progress = value
+            self.progress_signal.emit(value)
 
-            self.status_signal.emit(f"Création du {self.output_format.upper()} : {self.filename}")
 
-            if self.output_format == 'cbz':
-                self.create_cbz(output_path)
-            elif self.output_format == 'epub':
-                self.create_epub(output_path)
+class CodecComboBox(QComboBox):
+    """Liste des codecs : ceux que le Pillow installé ne sait pas écrire sont grisés à la première ouverture
 
-            if self.is_running:
-                self.progress_signal.emit(100)
-                self.result_signal.emit(f"{self.filename}.{self.output_format}", True)
-                self.status_signal.emit("Conversion terminée !")
+    Interroger Pillow charge tous ses greffons d'image, ce qui ralentirait le
+    démarrage ; un codec choisi sans ouvrir la liste est vérifié à la conversion.
+    """
 
-        except Exception as e:
-            self.result_signal.emit(f"Erreur générale: {str(e)}", False)
-            self.status_signal.emit("Erreur lors de la conversion !")
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.checked = False
 
-        self.stop_loading_signal.emit()
-
-    def create_cbz(self, output_path):
-        """Créer un fichier CBZ"""
-        temp_dir = "temp_images"
-        os.makedirs(temp_dir, exist_ok=True)
-
-        try:
-            # Traiter les images
-            total_images = len(self.png_paths)
-            for i, png_path in enumerate(self.png_paths):
-                if not self.is_running:
-                    return
-
-                try:
-                    with Image.open(png_path) as img:
-                        # Convertir en RGB si nécessaire
-                        if img.mode in ('RGBA', 'LA', 'P'):
-                            rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-                            if img.mode == 'P':
-                                img = img.convert('RGBA')
-                            rgb_img.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-                            img = rgb_img
-
-                        # Sauvegarder avec un nom ordonné
-                        output_filename = f"page_{i + 1:03d}.jpg"
-                        temp_path = os.path.join(temp_dir, output_filename)
-                        img.save(temp_path, "JPEG", quality=95)
-
-                except Exception as e:
-                    self.result_signal.emit(f"Erreur avec {os.path.basename(png_path)}: {str(e)}", False)
-                    continue
-
-                progress = int(((i + 1) / total_images) * 80)
-                self.progress_signal.emit(progress)
-
-            # Créer le fichier CBZ
-            if self.is_running:
-                self.status_signal.emit("Création du fichier CBZ...")
-                with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as cbz:
-                    for img_file in sorted(os.listdir(temp_dir)):
-                        if not self.is_running:
-                            break
-                        cbz.write(os.path.join(temp_dir, img_file), img_file)
-
-        finally:
-            self.cleanup_temp_dir(temp_dir)
-
-    def create_epub(self, output_path):
-        """Créer un fichier EPUB"""
-        temp_dir = "temp_epub"
-        os.makedirs(temp_dir, exist_ok=True)
-
-        try:
-            # Structure EPUB
-            os.makedirs(os.path.join(temp_dir, "META-INF"), exist_ok=True)
-            os.makedirs(os.path.join(temp_dir, "OEBPS", "images"), exist_ok=True)
-
-            # Fichier mimetype
-            with open(os.path.join(temp_dir, "mimetype"), "w") as f:
-                f.write("application/epub+zip")
-
-            # META-INF/container.xml
-            container_xml = '''<?xml version="1.0" encoding="UTF-8"?>
-<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
-    <rootfiles>
-        <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
-    </rootfiles>
-</container>'''
-            with open(os.path.join(temp_dir, "META-INF", "container.xml"), "w") as f:
-                f.write(container_xml)
-
-            # Traiter les images
-            total_images = len(self.png_paths)
-            image_files = []
-
-            for i, png_path in enumerate(self.png_paths):
-                if not self.is_running:
-                    return
-
-                try:
-                    with Image.open(png_path) as img:
-                        # Convertir en RGB si nécessaire
-                        if img.mode in ('RGBA', 'LA', 'P'):
-                            rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-                            if img.mode == 'P':
-                                img = img.convert('RGBA')
-                            rgb_img.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-                            img = rgb_img
-
-                        # Sauvegarder l'image
-                        img_filename = f"page_{i + 1:03d}.jpg"
-                        img_path = os.path.join(temp_dir, "OEBPS", "images", img_filename)
-                        img.save(img_path, "JPEG", quality=95)
-                        image_files.append(img_filename)
-
-                except Exception as e:
-                    self.result_signal.emit(f"Erreur avec {os.path.basename(png_path)}: {str(e)}", False)
-                    continue
-
-                progress = int(((i + 1) / total_images) * 60)
-                self.progress_signal.emit(progress)
-
-            if not self.is_running:
-                return
-
-            # Créer content.opf
-            self.create_epub_content_opf(temp_dir, image_files)
-
-            # Créer toc.ncx
-            self.create_epub_toc_ncx(temp_dir)
-
-            # Créer les pages XHTML
-            self.create_epub_pages(temp_dir, image_files)
-
-            # Créer le fichier EPUB
-            self.status_signal.emit("Création du fichier EPUB...")
-            self.progress_signal.emit(90)
-
-            with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_STORED) as epub:
-                # Ajouter mimetype en premier (non compressé)
-                epub.write(os.path.join(temp_dir, "mimetype"), "mimetype")
-
-                # Ajouter le reste avec compression
-                for root, dirs, files in os.walk(temp_dir):
-                    for file in files:
-                        if file == "mimetype":
-                            continue
-                        file_path = os.path.join(root, file)
-                        arc_path = os.path.relpath(file_path, temp_dir)
-                        epub.write(file_path, arc_path, zipfile.ZIP_DEFLATED)
-
-        finally:
-            self.cleanup_temp_dir(temp_dir)
-
-    def create_epub_content_opf(self, temp_dir, image_files):
-        """Créer le fichier content.opf pour EPUB"""
-        manifest_items = []
-        spine_items = []
-
-        for i, img_file in enumerate(image_files):
-            page_id = f"page_{i + 1:03d}"
-            manifest_items.append(
-                f'    <item id="{page_id}" href="pages/{page_id}.xhtml" media-type="application/xhtml+xml"/>')
-            manifest_items.append(f'    <item id="img_{i + 1:03d}" href="images/{img_file}" media-type="image/jpeg"/>')
-            spine_items.append(f'    <itemref idref="{page_id}"/>')
-
-        content_opf = f'''<?xml version="1.0" encoding="UTF-8"?>
-<package xmlns="http://www.idpf.org/2007/opf" unique-identifier="BookId" version="2.0">
-    <metadata xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:opf="http://www.idpf.org/2007/opf">
-        <dc:title>{self.filename}</dc:title>
-        <dc:creator>Image Converter</dc:creator>
-        <dc:identifier id="BookId">urn:uuid:{self.filename}</dc:identifier>
-        <dc:language>fr</dc:language>
-        <meta name="cover" content="img_001"/>
-    </metadata>
-    <manifest>
-        <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
-{chr(10).join(manifest_items)}
-    </manifest>
-    <spine toc="ncx">
-{chr(10).join(spine_items)}
-    </spine>
-</package>'''
-
-        with open(os.path.join(temp_dir, "OEBPS", "content.opf"), "w", encoding="utf-8") as f:
-            f.write(content_opf)
-
-    def create_epub_toc_ncx(self, temp_dir):
-        """Créer le fichier toc.ncx pour EPUB"""
-        toc_ncx = f'''<?xml version="1.0" encoding="UTF-8"?>
-<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
-    <head>
-        <meta name="dtb:uid" content="urn:uuid:{self.filename}"/>
-        <meta name="dtb:depth" content="1"/>
-        <meta name="dtb:totalPageCount" content="0"/>
-        <meta name="dtb:maxPageNumber" content="0"/>
-    </head>
-    <docTitle>
-        <text>{self.filename}</text>
-    </docTitle>
-    <navMap>
-        <navPoint id="navpoint-1" playOrder="1">
-            <navLabel>
-                <text>Début</text>
-            </navLabel>
-            <content src="pages/page_001.xhtml"/>
-        </navPoint>
-    </navMap>
-</ncx>'''
-
-        with open(os.path.join(temp_dir, "OEBPS", "toc.ncx"), "w", encoding="utf-8") as f:
-            f.write(toc_ncx)
-
-    def create_epub_pages(self, temp_dir, image_files):
-        """Créer les pages XHTML pour EPUB"""
-        os.makedirs(os.path.join(temp_dir, "OEBPS", "pages"), exist_ok=True)
-
-        for i, img_file in enumerate(image_files):
-            if not self.is_running:
-                return
-
-            page_content = f'''<?xml version="1.0" encoding="UTF-8"?>
-<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.1//EN" "http://www.w3.org/TR/xhtml11/DTD/xhtml11.dtd">
-<html xmlns="http://www.w3.org/1999/xhtml">
-<head>
-    <title>Page {i + 1}</title>
-    <style type="text/css">
-        body {{ margin: 0; padding: 0; text-align: center; }}
-        img {{ max-width: 100%; max-height: 100%; }}
-    </style>
-</head>
-<body>
-    <img src="../images/{img_file}" alt="Page {i + 1}"/>
-</body>
-</html>'''
-
-            page_filename = f"page_{i + 1:03d}.xhtml"
-            with open(os.path.join(temp_dir, "OEBPS", "pages", page_filename), "w", encoding="utf-8") as f:
-                f.write(page_content)
-
-    def stop(self):
-        self.is_running = False
-
-    def cleanup_temp_dir(self, temp_dir):
-        """Nettoie le dossier temporaire"""
-        try:
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-        except:
-            pass
+    def showPopup(self):
+        if not self.checked:
+            self.checked = True
+            from converter import available_codecs
+            available = available_codecs()
+            for row in range(self.count()):
+                if self.itemData(row) not in available:
+                    self.model().item(row).setEnabled(False)
+        super().showPopup()
 
 
 class ImageConverterApp(QWidget):
     def __init__(self):
         super().__init__()
-        self.png_paths = []
+        self.page_model = PageListModel(self)
         self.use_separate_folder = True
-        self.worker = None
+        self.page_cache = None
+        self.preflight_worker = None
+        self.job_rows = {}
         self.init_ui()
 
+        # File des livres : plusieurs conversions simultanées sur un pool de processus partagé
+        self.job_queue = JobQueue(parent=self)
+        self.job_queue.job_added.connect(self.add_job_row)
+        self.job_queue.job_started.connect(self.connect_job)
+        self.job_queue.job_progress.connect(self.update_job_progress)
+        self.job_queue.job_finished.connect(self.update_job_row)
+        self.job_queue.active_changed.connect(self.set_queue_active)
+
+        # Débit total relevé chaque seconde pendant que la file travaille
+        self.throughput_timer = QTimer(self)
+        self.throughput_timer.setInterval(1000)
+        self.throughput_timer.timeout.connect(self.update_throughput)
+
     def init_ui(self):
         self.setWindowTitle("Convertisseur d'Images → CBZ/EPUB")
         self.setGeometry(100, 100, 650, 650)
@@ -324,7 +153,16 @@ class ImageConverterApp(QWidget):
         # Liste des fichiers sélectionnés avec boutons de réorganisation
         list_layout = QHBoxLayout()
 
-        self.file_list = QListWidget()
+        # Vue sur le modèle des pages : seules les lignes affichées sont dessinées et ont leur miniature
+        self.file_list = QListView()
+        self.file_list.setModel(self.page_model)
+        self.file_list.setUniformItemSizes(True)
+        self.file_list.setIconSize(THUMBNAIL_SIZE)
+        self.file_list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        # Réorganisation par glisser-déposer, à l'intérieur de la liste
+        self.file_list.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
+        self.file_list.setDefaultDropAction(Qt.DropAction.MoveAction)
+        self.file_list.verticalScrollBar().valueChanged.connect(self.cancel_hidden_thumbnails)
         list_layout.addWidget(self.file_list)
 
         # Boutons pour réorganiser
@@ -337,6 +175,17 @@ class ImageConverterApp(QWidget):
         self.move_down_button.clicked.connect(self.move_down)
         order_buttons_layout.addWidget(self.move_down_button)
 
+        # Tri naturel : par nom (page2 avant page10) ou par dernier numéro du nom
+        self.sort_name_button = QPushButton("A→Z")
+        self.sort_name_button.setToolTip("Trier par nom de fichier (ordre naturel)")
+        self.sort_name_button.clicked.connect(lambda: self.page_model.sort_pages('name'))
+        order_buttons_layout.addWidget(self.sort_name_button)
+
+        self.sort_number_button = QPushButton("1→9")
+        self.sort_number_button.setToolTip("Trier par le dernier numéro du nom de fichier")
+        self.sort_number_button.clicked.connect(lambda: self.page_model.sort_pages('number'))
+        order_buttons_layout.addWidget(self.sort_number_button)
+
         order_buttons_layout.addStretch()
         list_layout.addLayout(order_buttons_layout)
 
@@ -356,8 +205,49 @@ class ImageConverterApp(QWidget):
         self.format_combo.setCurrentText("CBZ")
         name_format_layout.addWidget(self.format_combo)
 
+        name_format_layout.addWidget(QLabel("Profil:"))
+        self.profile_combo = QComboBox()
+        for name, profile in PROFILES.items():
+            self.profile_combo.addItem(profile.label, name)
+        self.profile_combo.setCurrentIndex(list(PROFILES).index(DEFAULT_PROFILE))
+        name_format_layout.addWidget(self.profile_combo)
+
+        name_format_layout.addWidget(QLabel("Processus:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, (os.cpu_count() or 1) * 2)
+        self.workers_spin.setValue(os.cpu_count() or 1)
+        name_format_layout.addWidget(self.workers_spin)
+
+        name_format_layout.addWidget(QLabel("Livres:"))
+        self.books_spin = QSpinBox()
+        self.books_spin.setRange(1, 8)
+        self.books_spin.setValue(DEFAULT_MAX_BOOKS)
+        self.books_spin.setToolTip("Nombre de livres convertis en même temps, sur le même pool de processus")
+        name_format_layout.addWidget(self.books_spin)
+
         layout.addLayout(name_format_layout)
 
+        # Codec des pages et taille visée par page
+        codec_layout = QHBoxLayout()
+
+        codec_layout.addWidget(QLabel("Codec:"))
+        self.codec_combo = CodecComboBox()
+        for name, codec in CODECS.items():
+            self.codec_combo.addItem(codec.label, name)
+        self.codec_combo.setCurrentIndex(self.codec_combo.findData(DEFAULT_CODEC))
+        codec_layout.addWidget(self.codec_combo)
+
+        codec_layout.addWidget(QLabel("Taille cible par page:"))
+        self.target_size_spin = QSpinBox()
+        self.target_size_spin.setRange(0, 10000)
+        self.target_size_spin.setSingleStep(50)
+        self.target_size_spin.setSuffix(" Ko")
+        self.target_size_spin.setSpecialValueText("aucune")
+        codec_layout.addWidget(self.target_size_spin)
+        codec_layout.addStretch()
+
+        layout.addLayout(codec_layout)
+
         # Sélection du dossier de sortie
         output_layout = QHBoxLayout()
         self.output_button = QPushButton("Choisir dossier de sortie")
@@ -374,13 +264,63 @@ class ImageConverterApp(QWidget):
         self.folder_checkbox.stateChanged.connect(self.toggle_folder_option)
         layout.addWidget(self.folder_checkbox)
 
+        # Option de copie des JPEG sans réencodage
+        self.passthrough_checkbox = QCheckBox("Copier les JPEG déjà compatibles sans les réencoder")
+        self.passthrough_checkbox.setChecked(True)
+        layout.addWidget(self.passthrough_checkbox)
+
+        # Option d'enregistrement en niveaux de gris des pages sans couleur
+        self.grayscale_checkbox = QCheckBox("Enregistrer en niveaux de gris les pages sans couleur")
+        self.grayscale_checkbox.setChecked(True)
+        layout.addWidget(self.grayscale_checkbox)
+
+        # Pré-traitement des pages scannées
+        preprocess_layout = QHBoxLayout()
+        preprocess_layout.addWidget(QLabel("Pré-traitement:"))
+        self.autocrop_checkbox = QCheckBox("Rogner les marges")
+        preprocess_layout.addWidget(self.autocrop_checkbox)
+        self.split_checkbox = QCheckBox("Couper les doubles pages")
+        preprocess_layout.addWidget(self.split_checkbox)
+        self.rtl_checkbox = QCheckBox("Lecture de droite à gauche (manga)")
+        preprocess_layout.addWidget(self.rtl_checkbox)
+        self.deskew_checkbox = QCheckBox("Redresser les pages")
+        preprocess_layout.addWidget(self.deskew_checkbox)
+        preprocess_layout.addStretch()
+        layout.addLayout(preprocess_layout)
+
+        # Option de cache des pages encodées
+        self.cache_checkbox = QCheckBox("Réutiliser les pages déjà encodées (cache)")
+        self.cache_checkbox.setChecked(True)
+        layout.addWidget(self.cache_checkbox)
+
+        # Option de reprise d'une conversion arrêtée ou interrompue
+        self.resume_checkbox = QCheckBox("Reprendre une conversion interrompue là où elle s'est arrêtée")
+        self.resume_checkbox.setChecked(True)
+        layout.addWidget(self.resume_checkbox)
+
+        # Option de trace des temps par page (fichier Chrome trace à côté de l'archive)
+        self.trace_checkbox = QCheckBox("Enregistrer une trace des temps par page (.trace.json)")
+        layout.addWidget(self.trace_checkbox)
+
         # Boutons pour démarrer et arrêter la conversion
         button_layout = QHBoxLayout()
         self.convert_button = QPushButton("Démarrer la conversion")
+        self.convert_button.setToolTip("Ajouter ce livre à la file ; il démarre dès qu'une place se libère")
         self.convert_button.clicked.connect(self.start_conversion)
         button_layout.addWidget(self.convert_button)
 
-        self.stop_button = QPushButton("🛑 Stop")
+        self.preflight_button = QPushButton("🔍 Vérifier")
+        self.preflight_button.setToolTip("Lire les en-têtes des pages : pages illisibles, tronquées ou en double, "
+                                         "et estimation de la taille et de la durée")
+        self.preflight_button.clicked.connect(self.start_preflight)
+        button_layout.addWidget(self.preflight_button)
+
+        self.queue_books_button = QPushButton("📚 Ajouter des livres")
+        self.queue_books_button.setToolTip("Mettre en file des archives (un livre chacune) avec les réglages actuels")
+        self.queue_books_button.clicked.connect(self.queue_books)
+        button_layout.addWidget(self.queue_books_button)
+
+        self.stop_button = QPushButton("🛑 Tout arrêter")
         self.stop_button.clicked.connect(self.stop_conversion)
         self.stop_button.setVisible(False)
         button_layout.addWidget(self.stop_button)
@@ -392,16 +332,10 @@ class ImageConverterApp(QWidget):
         self.status_label = QLabel("Aucune conversion en cours")
         self.status_layout.addWidget(self.status_label)
 
-        # Animation de chargement (optionnelle)
-        try:
-            self.loading_gif = QMovie("loading.gif")
-            self.loading_gif.setScaledSize(QSize(30, 30))
-            self.loading_label = QLabel()
-            self.loading_label.setMovie(self.loading_gif)
-            self.loading_label.setVisible(False)
-            self.status_layout.addWidget(self.loading_label)
-        except:
-            self.loading_label = None
+        # Animation de chargement (optionnelle) : loading.gif n'est lu qu'au premier livre
+        self.loading_gif = None
+        self.loading_label = None
+        self.loading_checked = False
 
         layout.addLayout(self.status_layout)
 
@@ -417,6 +351,13 @@ class ImageConverterApp(QWidget):
 
         layout.addLayout(self.progress_layout)
 
+        # Profondeur des files du pipeline, pour régler le parallélisme et le budget mémoire
+        self.stages_label = QLabel("")
+        layout.addWidget(self.stages_label)
+
+        # File des livres : le tableau n'est construit qu'à l'ajout du premier livre (voir create_job_table)
+        self.job_table = None
+
         # Liste des résultats
         self.result_list = QListWidget()
         layout.addWidget(self.result_list)
@@ -428,52 +369,44 @@ class ImageConverterApp(QWidget):
 
     def select_pngs(self):
         png_paths, _ = QFileDialog.getOpenFileNames(
-            self, "Sélectionner des images", "",
-            "Images (*.png *.jpg *.jpeg *.bmp *.gif *.tiff)"
+            self, "Sélectionner des images", "", SOURCE_FILTER
         )
-        if png_paths:
-            self.png_paths = list(png_paths)
-            self.update_file_list()
+        pages = self.expand_sources(png_paths)
+        if pages:
+            self.page_model.set_paths(pages)
 
     def add_pngs(self):
         png_paths, _ = QFileDialog.getOpenFileNames(
-            self, "Ajouter des images", "",
-            "Images (*.png *.jpg *.jpeg *.bmp *.gif *.tiff)"
+            self, "Ajouter des images", "", SOURCE_FILTER
         )
-        if png_paths:
-            self.png_paths.extend(png_paths)
-            self.update_file_list()
+        pages = self.expand_sources(png_paths)
+        if pages:
+            self.page_model.add_paths(pages)
+
+    def expand_sources(self, paths):
+        # Une archive (CBZ, ZIP, CBR, PDF) est remplacée par ses pages, dans l'ordre naturel des entrées
+        try:
+            return expand_sources(paths)
+        except Exception as e:
+            QMessageBox.warning(self, "Attention", f"Impossible de lire l'archive : {e}")
+            return []
 
     def remove_selected(self):
-        selected_items = self.file_list.selectedItems()
-        if selected_items:
-            for item in selected_items:
-                filename = item.text()
-                for png in self.png_paths:
-                    if os.path.basename(png) == filename:
-                        self.png_paths.remove(png)
-                        break
-                self.file_list.takeItem(self.file_list.row(item))
+        page_ids = [self.page_model.page_id(index.row()) for index in self.file_list.selectionModel().selectedRows()]
+        self.page_model.remove_pages(page_ids)
 
     def move_up(self):
-        current_row = self.file_list.currentRow()
+        current_row = self.file_list.currentIndex().row()
         if current_row > 0:
-            # Échanger dans la liste des chemins
-            self.png_paths[current_row], self.png_paths[current_row - 1] = \
-                self.png_paths[current_row - 1], self.png_paths[current_row]
-            # Mettre à jour l'affichage
-            self.update_file_list()
-            self.file_list.setCurrentRow(current_row - 1)
+            # La ligne courante suit la page déplacée
+            self.page_model.move_row(current_row, current_row - 1)
+            self.file_list.scrollTo(self.file_list.currentIndex())
 
     def move_down(self):
-        current_row = self.file_list.currentRow()
-        if current_row < len(self.png_paths) - 1 and current_row >= 0:
-            # Échanger dans la liste des chemins
-            self.png_paths[current_row], self.png_paths[current_row + 1] = \
-                self.png_paths[current_row + 1], self.png_paths[current_row]
-            # Mettre à jour l'affichage
-            self.update_file_list()
-            self.file_list.setCurrentRow(current_row + 1)
+        current_row = self.file_list.currentIndex().row()
+        if current_row >= 0:
+            self.page_model.move_row(current_row, current_row + 1)
+            self.file_list.scrollTo(self.file_list.currentIndex())
 
     def select_output_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Choisir le dossier de sortie")
@@ -485,7 +418,7 @@ class ImageConverterApp(QWidget):
         self.use_separate_folder = state == Qt.CheckState.Checked.value
 
     def start_conversion(self):
-        if not self.png_paths:
+        if not self.page_model.rowCount():
             QMessageBox.warning(self, "Attention", "Aucune image sélectionnée !")
             return
 
@@ -499,59 +432,298 @@ class ImageConverterApp(QWidget):
             return
 
         # Nettoyer le nom du fichier
-        filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_')).strip()
+        filename = clean_filename(filename)
         output_format = self.format_combo.currentText()
 
-        self.worker = ImageConverterWorker(
-            self.png_paths, filename, self.output_folder,
-            self.use_separate_folder, output_format
+        if self.queue_book(filename, self.page_model.paths(), output_format):
+            # La liste est vidée pour préparer le livre suivant
+            self.page_model.set_paths([])
+            self.filename_input.clear()
+
+    def queue_books(self):
+        # Chaque archive choisie devient un livre, nommé d'après son fichier
+        if not self.output_folder:
+            QMessageBox.warning(self, "Attention", "Veuillez sélectionner un dossier de sortie !")
+            return
+
+        paths, _ = QFileDialog.getOpenFileNames(self, "Ajouter des livres à la file", "", BOOK_FILTER)
+        output_format = self.format_combo.currentText()
+        for path in paths:
+            try:
+                pages = book_pages(path)
+            except Exception as e:
+                self.result_list.addItem(f"❌ {book_name(path)} : {e}")
+                continue
+            if pages:
+                self.queue_book(clean_filename(book_name(path)), pages, output_format)
+
+    def queue_book(self, filename, pages, output_format):
+        """Mettre un livre en file avec les réglages actuels ; False s'il n'a pas pu être ajouté"""
+        self.job_queue.set_limits(self.books_spin.value(), self.workers_spin.value())
+        options = self.conversion_options(filename)
+        try:
+            self.job_queue.add_job(filename, pages, output_format, self.output_folder,
+                                   self.use_separate_folder, **options)
+        except ValueError as e:
+            if options['tracer'] is not None:
+                options['tracer'].close()
+            QMessageBox.warning(self, "Attention", str(e))
+            return False
+        return True
+
+    def encode_options(self):
+        # Réglages qui déterminent le contenu des pages
+        return dict(
+            passthrough=self.passthrough_checkbox.isChecked(),
+            profile=self.profile_combo.currentData(),
+            codec=self.codec_combo.currentData(),
+            grayscale=self.grayscale_checkbox.isChecked(),
+            target_bytes=self.target_size_spin.value() * 1024 or None,
+            autocrop=self.autocrop_checkbox.isChecked(),
+            deskew=self.deskew_checkbox.isChecked(),
+            split_spreads=self.split_checkbox.isChecked(),
+            right_to_left=self.rtl_checkbox.isChecked()
         )
-        self.worker.progress_signal.connect(self.update_progress)
-        self.worker.status_signal.connect(self.status_label.setText)
-        self.worker.result_signal.connect(self.update_results)
-        self.worker.start_loading_signal.connect(self.start_loading_animation)
-        self.worker.stop_loading_signal.connect(self.stop_loading_animation)
 
-        self.worker.start()
-        self.stop_button.setVisible(True)
-        self.convert_button.setEnabled(False)
+    def conversion_options(self, filename):
+        return dict(
+            self.encode_options(),
+            cache=self.get_page_cache() if self.cache_checkbox.isChecked() else None,
+            tracer=self.create_tracer(filename),
+            resume=self.resume_checkbox.isChecked()
+        )
 
-    def stop_conversion(self):
-        if self.worker:
-            self.worker.stop()
-            self.stop_button.setVisible(False)
-            self.convert_button.setEnabled(True)
+    def start_preflight(self):
+        if not self.page_model.rowCount():
+            QMessageBox.warning(self, "Attention", "Aucune image sélectionnée !")
+            return
+
+        paths = self.page_model.paths()
+        # Le convertisseur n'est construit que pour traduire les réglages en arguments d'encodage
+        from converter import BookConverter
+        encode_args = BookConverter(paths, "", "", False, "cbz", **self.encode_options()).encode_args()
+        self.preflight_worker = PreflightWorker(paths, encode_args, self.workers_spin.value())
+        self.preflight_worker.progress_signal.connect(
+            lambda value: self.status_label.setText(f"Vérification des pages : {value}%"))
+        self.preflight_worker.report_signal.connect(self.show_preflight_report)
+        self.preflight_button.setEnabled(False)
+        self.preflight_worker.start()
+
+    def show_preflight_report(self, report):
+        self.preflight_button.setEnabled(True)
+        self.status_label.setText("Vérification terminée")
+        from preflight import report_lines
+        for line in report_lines(report):
+            self.result_list.addItem(f"🔍 {line}")
+
+        # Sélectionner les pages à problème, pour les retirer d'un clic sur ➖
+        flagged = {path for path, _ in report['errors']} | set(report['truncated'])
+        if flagged:
+            selection = self.file_list.selectionModel()
+            selection.clearSelection()
+            for row, path in enumerate(self.page_model.paths()):
+                if path in flagged:
+                    selection.select(self.page_model.index(row), QItemSelectionModel.SelectionFlag.Select)
+            self.result_list.addItem(
+                "🔍 Les pages illisibles ou tronquées sont sélectionnées dans la liste (➖ pour les retirer)")
+
+    def create_job_table(self):
+        """Tableau de la file des livres : avancement et annulation de chaque livre, au-dessus des résultats"""
+        self.job_table = QTableWidget(0, 4)
+        self.job_table.setHorizontalHeaderLabels(["Livre", "Pages", "Avancement", ""])
+        self.job_table.verticalHeader().setVisible(False)
+        self.job_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.job_table.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        header = self.job_table.horizontalHeader()
+        header.setSectionResizeMode(JOB_NAME_COLUMN, QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(JOB_PAGES_COLUMN, QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(JOB_CANCEL_COLUMN, QHeaderView.ResizeMode.ResizeToContents)
+        layout = self.layout()
+        layout.insertWidget(layout.indexOf(self.result_list), self.job_table)
+
+    def add_job_row(self, job_id):
+        if self.job_table is None:
+            self.create_job_table()
+        job = self.job_queue.jobs[job_id]
+        row = self.job_table.rowCount()
+        self.job_rows[job_id] = row
+        self.job_table.insertRow(row)
+
+        name_item = QTableWidgetItem(f"{job.name}.{job.output_format.lower()}")
+        name_item.setToolTip(job.output_path)
+        self.job_table.setItem(row, JOB_NAME_COLUMN, name_item)
+        self.job_table.setItem(row, JOB_PAGES_COLUMN, QTableWidgetItem(str(len(job.pages))))
+
+        progress_bar = QProgressBar()
+        progress_bar.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        progress_bar.setValue(0)
+        self.job_table.setCellWidget(row, JOB_PROGRESS_COLUMN, progress_bar)
+
+        cancel_button = QPushButton("✖")
+        cancel_button.setToolTip("Annuler ce livre (un livre arrêté pourra être repris)")
+        cancel_button.clicked.connect(lambda: self.job_queue.cancel(job_id))
+        self.job_table.setCellWidget(row, JOB_CANCEL_COLUMN, cancel_button)
+        self.update_job_row(job_id)
+
+    def connect_job(self, job_id):
+        # Les messages de chaque livre sont préfixés par son nom : plusieurs livres avancent en même temps
+        job = self.job_queue.jobs[job_id]
+        name = job.name
+        worker = job.worker
+        worker.result_signal.connect(lambda message, success: self.update_results(message, success, name))
+        worker.page_report_signal.connect(lambda page_report: self.show_page_report(page_report, name))
+        worker.timing_signal.connect(lambda timings: self.show_timings(timings, name))
+        worker.cache_stats_signal.connect(lambda stats: self.show_cache_stats(stats, name))
+        worker.stages_signal.connect(lambda stages: self.update_stages(stages, name))
+        self.update_job_row(job_id)
+
+    def update_job_progress(self, job_id, value):
+        self.job_table.cellWidget(self.job_rows[job_id], JOB_PROGRESS_COLUMN).setValue(value)
+
+    def update_job_row(self, job_id):
+        job = self.job_queue.jobs[job_id]
+        row = self.job_rows[job_id]
+        progress_bar = self.job_table.cellWidget(row, JOB_PROGRESS_COLUMN)
+        if job.state == JOB_RUNNING:
+            progress_bar.setFormat("%p%")
+        else:
+            progress_bar.setFormat(job.state)
+        if job.state == JOB_DONE:
+            progress_bar.setValue(100)
+        self.job_table.cellWidget(row, JOB_CANCEL_COLUMN).setEnabled(job.state in (JOB_PENDING, JOB_RUNNING))
+
+    def set_queue_active(self, active):
+        self.stop_button.setVisible(active)
+        if active:
+            self.throughput_timer.start()
+            self.start_loading_animation()
+        else:
+            self.throughput_timer.stop()
+            self.stop_loading_animation()
+            self.stages_label.setText("")
+            stats = self.job_queue.throughput()
+            self.status_label.setText(
+                f"File terminée : {stats['pages']} pages en {stats['elapsed']:.1f} s "
+                f"({stats['average_pages_per_second']:.1f} pages/s), {stats['bytes'] / 1e6:.1f} Mo")
+
+    def update_throughput(self):
+        stats = self.job_queue.throughput()
+        total = stats['total_pages']
+        self.update_progress(stats['pages'] * 100 // total if total else 0)
+        self.status_label.setText(
+            f"Débit : {stats['pages_per_second']:.1f} pages/s (moyenne {stats['average_pages_per_second']:.1f}) · "
+            f"{stats['pages']}/{total} pages · {stats['running']} livre(s) en cours, {stats['pending']} en attente")
+
+    def create_tracer(self, filename):
+        # Fichier de trace à ouvrir dans chrome://tracing ou https://ui.perfetto.dev
+        if not self.trace_checkbox.isChecked():
+            return None
+        return PageTracer(os.path.join(self.output_folder, f"{filename}.trace.json"))
+
+    def get_page_cache(self):
+        # Le cache est ouvert à la première conversion qui l'utilise
+        if self.page_cache is None:
+            self.page_cache = PageCache()
+        return self.page_cache
 
-    def update_file_list(self):
-        self.file_list.clear()
-        for i, png in enumerate(self.png_paths):
-            self.file_list.addItem(f"{i + 1:02d}. {os.path.basename(png)}")
+    def stop_conversion(self):
+        self.job_queue.cancel_all()
 
     def update_progress(self, value):
         self.progress_bar.setValue(value)
         self.progress_label.setText(f"{value}%")
 
-    def update_results(self, filename, success):
+    def update_stages(self, stages, name):
+        self.stages_label.setText(
+            f"{name} — files — lecture : {stages['read']} · encodage : {stages['encode']} · "
+            f"ordonnancement : {stages['reorder']} · écriture : {stages['write']} · "
+            f"en cours : {stages['in_flight']} pages, {stages['memory'] / 1e6:.0f} Mo")
+
+    def update_results(self, message, success, name):
         if success:
-            self.result_list.addItem(f"✅ {filename}")
+            self.result_list.addItem(f"✅ {message}")
         else:
-            self.result_list.addItem(f"❌ {filename}")
+            self.result_list.addItem(f"❌ {name} : {message}")
+
+    def show_page_report(self, page_report, name):
+        from converter import PAGE_COPIED, PAGE_CACHED, PAGE_SIMILAR
+        copied = sum(1 for _, _, action in page_report if action == PAGE_COPIED)
+        cached = sum(1 for _, _, action in page_report if action in (PAGE_CACHED, PAGE_SIMILAR))
+        item = QListWidgetItem(
+            f"ℹ️ {name} : {copied} page(s) copiée(s), {cached} page(s) en cache, "
+            f"{len(page_report) - copied - cached} page(s) réencodée(s)")
+        # Détail page par page dans l'infobulle
+        item.setToolTip("\n".join(
+            f"Page {number}: {os.path.basename(png)} ({action})" for number, png, action in page_report))
+        self.result_list.addItem(item)
+
+    def show_timings(self, timings, name):
+        # Les temps de traitement des pages sont cumulés sur tous les processus du pool
+        self.result_list.addItem(
+            f"⏱️ {name} : décodage {timings['decode']:.2f} s, conversion {timings['convert']:.2f} s, "
+            f"encodage {timings['encode']:.2f} s (cumulés), "
+            f"écriture de l'archive {timings['write']:.2f} s")
+
+    def show_cache_stats(self, stats, name):
+        lookups = stats['hits'] + stats['similar'] + stats['misses']
+        if lookups:
+            hit_rate = (stats['hits'] + stats['similar']) / lookups
+            self.result_list.addItem(
+                f"🗃️ {name} : cache {hit_rate:.0%} de succès ({stats['similar']} image(s) identique(s) reprise(s)), "
+                f"{stats['bytes_saved'] / 1e6:.1f} Mo non réencodés")
+        if stats['duplicates']:
+            self.result_list.addItem(
+                f"♻️ {name} : {stats['duplicates']} page(s) en double pointant vers une même image, "
+                f"{stats['duplicate_bytes'] / 1e6:.1f} Mo économisés")
 
     def start_loading_animation(self):
+        if not self.loading_checked:
+            self.loading_checked = True
+            movie = QMovie(resource_path("loading.gif"))
+            if movie.isValid():
+                movie.setScaledSize(QSize(30, 30))
+                self.loading_gif = movie
+                self.loading_label = QLabel()
+                self.loading_label.setMovie(movie)
+                self.status_layout.addWidget(self.loading_label)
         if self.loading_label:
             self.loading_label.setVisible(True)
             self.loading_gif.start()
 
+    def cancel_hidden_thumbnails(self):
+        """Abandonner les miniatures demandées pour des lignes sorties de la zone affichée"""
+        viewport = self.file_list.viewport()
+        first = self.file_list.indexAt(viewport.rect().topLeft()).row()
+        last = self.file_list.indexAt(viewport.rect().bottomLeft()).row()
+        # Entre deux lignes ou après la dernière : garder tout ce qui est de ce côté
+        self.page_model.cancel_outside(max(first, 0), last if last >= 0 else self.page_model.rowCount() - 1)
+
     def stop_loading_animation(self):
         if self.loading_label:
             self.loading_label.setVisible(False)
             self.loading_gif.stop()
-        self.stop_button.setVisible(False)
-        self.convert_button.setEnabled(True)
+
+    def closeEvent(self, event):
+        # Arrêter les livres en cours : ils pourront être repris au prochain lancement
+        self.job_queue.shutdown()
+        self.page_model.close_sources()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
+    # Nécessaire pour le pool de processus dans l'exécutable PyInstaller
+    multiprocessing.freeze_support()
+    marks = [("début", STARTED), ("imports", IMPORTED)]
     app = QApplication(sys.argv)
+    marks.append(("QApplication", time.perf_counter()))
     window = ImageConverterApp()
+    marks.append(("fenêtre", time.perf_counter()))
     window.show()
+    if "--startup-time" in sys.argv:
+        # Mesure du démarrage : la fenêtre se ferme après son premier affichage
+        def startup_done():
+            marks.append(("premier affichage", time.perf_counter()))
+            report_startup(marks)
+            window.close()
+        QTimer.singleShot(0, startup_done)
     sys.exit(app.exec())
\ No newline at end of file
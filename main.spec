@@ -1,34 +1,38 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
 
+# Animation de chargement optionnelle, livrée avec l'application si elle existe
+datas = [('loading.gif', '.')] if os.path.exists('loading.gif') else []
 
 a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=datas,
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Modules que l'application n'utilise jamais, mais que Pillow ou la bibliothèque standard peuvent tirer
+    excludes=['tkinter', 'numpy', 'unittest', 'pydoc', 'test'],
     noarchive=False,
-    optimize=0,
+    optimize=1,
 )
 pyz = PYZ(a.pure)
 
+# Exécutable en dossier (onedir) : un exécutable en un seul fichier décompresse toutes ses
+# bibliothèques (Qt compris) dans un dossier temporaire à chaque lancement. UPX est désactivé :
+# décompresser les DLL Qt au chargement ralentit aussi le démarrage.
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='main',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -36,3 +40,12 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='main',
+)
@@ -0,0 +1,324 @@
+"""Liste des pages de l'interface : modèle Qt et miniatures décodées à la demande"""
+import io
+import os
+import itertools
+import threading
+from collections import OrderedDict
+
+from PyQt6.QtCore import (
+    Qt, QAbstractListModel, QModelIndex, QObject, QRunnable, QThreadPool, QSize, QMimeData, pyqtSignal
+)
+from PyQt6.QtGui import QImage, QPixmap
+
+from sources import SourceReader, natural_key, numeric_suffix_key
+
+THUMBNAIL_SIZE = QSize(48, 64)
+# Nombre de miniatures gardées en mémoire (environ 12 Ko chacune)
+THUMBNAIL_CACHE_SIZE = 1000
+# Au-delà de ce nombre de blocs à supprimer, la vue est réinitialisée en une fois
+MAX_REMOVED_RANGES = 64
+PAGE_MIME_TYPE = "application/x-image-to-book-pages"
+SORT_KEYS = {'name': natural_key, 'number': numeric_suffix_key}
+
+
+def load_thumbnail(reader, path, size):
+    """Décoder la miniature d'une page (exécuté dans le pool de threads) ; QImage nulle en cas d'erreur"""
+    # Pillow n'est chargé qu'à la première miniature, pas au démarrage de l'interface
+    from PIL import Image
+    from converter import convert_to_rgb
+    try:
+        with Image.open(io.BytesIO(reader.read(path))) as img:
+            # thumbnail() utilise draft() : un JPEG est décodé directement à échelle réduite
+            img.thumbnail((size.width(), size.height()))
+            img = convert_to_rgb(img).convert('RGB')
+            data = img.tobytes()
+            # copy() : la QImage ne doit pas dépendre du tampon Python
+            return QImage(data, img.width, img.height, img.width * 3, QImage.Format.Format_RGB888).copy()
+    except Exception:
+        return QImage()
+
+
+class ThumbnailReaders:
+    """Un SourceReader par thread du pool : une archive n'est ouverte qu'une fois par thread
+
+    Sans lui, chaque miniature d'une page de CBZ/CBR relirait le répertoire
+    central de l'archive, et celle d'une page de PDF relirait tout le PDF.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Indexés par l'identifiant du thread : un threading.local ne survit pas d'une tâche Qt à
+        # l'autre, Python oubliant l'état d'un thread qu'il n'a pas créé dès que la tâche se termine
+        self.readers = {}
+
+    def reader(self):
+        with self.lock:
+            reader = self.readers.get(threading.get_ident())
+            if reader is None:
+                reader = self.readers[threading.get_ident()] = SourceReader()
+            return reader
+
+    def close(self):
+        """Fermer les archives ouvertes (aucune miniature ne doit être en cours)"""
+        with self.lock:
+            readers, self.readers = self.readers, {}
+        for reader in readers.values():
+            reader.close()
+
+
+class ThumbnailSignals(QObject):
+    # Émis depuis le pool, reçu dans le thread de l'interface
+    loaded = pyqtSignal(str, QImage)
+
+
+class ThumbnailTask(QRunnable):
+    def __init__(self, path, signals, readers):
+        super().__init__()
+        # Gardée par le modèle tant qu'elle est en attente, pour pouvoir la retirer du pool
+        self.setAutoDelete(False)
+        self.path = path
+        self.signals = signals
+        self.readers = readers
+
+    def run(self):
+        self.signals.loaded.emit(self.path, load_thumbnail(self.readers.reader(), self.path, THUMBNAIL_SIZE))
+
+
+def contiguous_ranges(rows):
+    """Regrouper des lignes triées en blocs (première, dernière)"""
+    ranges = []
+    for row in rows:
+        if ranges and row == ranges[-1][1] + 1:
+            ranges[-1][1] = row
+        else:
+            ranges.append([row, row])
+    return ranges
+
+
+class PageListModel(QAbstractListModel):
+    """Pages du livre dans l'ordre de conversion, avec leur miniature
+
+    Chaque page reçoit un identifiant stable à l'ajout : la sélection, la
+    suppression et le glisser-déposer travaillent sur ces identifiants, ce
+    qui distingue deux fichiers de même nom venant de dossiers différents.
+    L'index identifiant → ligne n'est recalculé qu'à la demande, après un
+    changement de structure.
+
+    Seules les lignes affichées demandent leur miniature (DecorationRole) :
+    elle est décodée dans un pool de threads puis gardée dans un cache LRU
+    borné. Déplacer une page ne touche que les lignes concernées.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.order = []
+        self.pages = {}
+        self.rows = None
+        self.ids = itertools.count(1)
+        self.thumbnails = OrderedDict()
+        self.pending = {}
+        self.tasks = {}
+
+        # Miniature vide de la bonne taille, pour que toutes les lignes aient la même hauteur
+        self.placeholder = QPixmap(THUMBNAIL_SIZE)
+        self.placeholder.fill(Qt.GlobalColor.transparent)
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(min(4, os.cpu_count() or 1))
+        self.readers = ThumbnailReaders()
+        self.signals = ThumbnailSignals(self)
+        self.signals.loaded.connect(self.thumbnail_loaded)
+
+    def paths(self):
+        """Chemins des pages, dans l'ordre"""
+        return [self.pages[page_id] for page_id in self.order]
+
+    def page_id(self, row):
+        return self.order[row]
+
+    def row_of(self, page_id):
+        """Ligne d'une page, ou None si elle a été supprimée"""
+        if self.rows is None:
+            self.rows = {page_id: row for row, page_id in enumerate(self.order)}
+        return self.rows.get(page_id)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.order)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        page_id = self.order[row]
+        path = self.pages[page_id]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{row + 1:02d}. {os.path.basename(path)}"
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return path
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.thumbnail(page_id, path)
+        return None
+
+    def flags(self, index):
+        # On dépose entre les lignes, jamais sur une page
+        if not index.isValid():
+            return Qt.ItemFlag.ItemIsDropEnabled
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsDragEnabled
+
+    def supportedDropActions(self):
+        return Qt.DropAction.MoveAction
+
+    def mimeTypes(self):
+        return [PAGE_MIME_TYPE]
+
+    def mimeData(self, indexes):
+        # Seulement les identifiants : pas de miniatures ni de texte à sérialiser
+        data = QMimeData()
+        data.setData(PAGE_MIME_TYPE, ",".join(str(self.order[index.row()]) for index in indexes).encode())
+        return data
+
+    def thumbnail(self, page_id, path):
+        """Miniature en cache, sinon demander son décodage et afficher une miniature vide"""
+        pixmap = self.thumbnails.get(path)
+        if pixmap is not None:
+            self.thumbnails.move_to_end(path)
+            return pixmap
+        waiting = self.pending.get(path)
+        if waiting is None:
+            self.pending[path] = {page_id}
+            self.tasks[path] = ThumbnailTask(path, self.signals, self.readers)
+            self.pool.start(self.tasks[path])
+        else:
+            waiting.add(page_id)
+        return self.placeholder
+
+    def thumbnail_loaded(self, path, image):
+        self.thumbnails[path] = QPixmap.fromImage(image) if not image.isNull() else self.placeholder
+        while len(self.thumbnails) > THUMBNAIL_CACHE_SIZE:
+            self.thumbnails.popitem(last=False)
+
+        # Les pages ont pu bouger ou disparaître depuis la demande
+        self.tasks.pop(path, None)
+        for page_id in self.pending.pop(path, ()):
+            row = self.row_of(page_id)
+            if row is not None:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+    def cancel_outside(self, first, last):
+        """Abandonner les miniatures pas encore commencées dont aucune page n'est entre ces lignes
+
+        Une miniature déjà en cours de décodage est gardée : elle arrivera dans le cache.
+        """
+        for path, page_ids in list(self.pending.items()):
+            rows = (self.row_of(page_id) for page_id in page_ids)
+            if any(row is not None and first <= row <= last for row in rows):
+                continue
+            if self.pool.tryTake(self.tasks[path]):
+                del self.pending[path]
+                del self.tasks[path]
+
+    def cancel_pending(self):
+        """Abandonner toutes les miniatures pas encore commencées"""
+        self.pool.clear()
+        self.pending.clear()
+        self.tasks.clear()
+
+    def close_sources(self):
+        """Abandonner les miniatures en attente et fermer les archives ouvertes par le pool"""
+        self.cancel_pending()
+        # Au plus une miniature par thread est encore en cours
+        self.pool.waitForDone()
+        self.readers.close()
+
+    def renumber(self, first, last=None):
+        # Les numéros affichés changent entre ces lignes
+        last = len(self.order) - 1 if last is None else last
+        if first <= last:
+            self.dataChanged.emit(self.index(first), self.index(last), [Qt.ItemDataRole.DisplayRole])
+
+    def new_pages(self, paths):
+        page_ids = []
+        for path in paths:
+            page_id = next(self.ids)
+            self.pages[page_id] = path
+            page_ids.append(page_id)
+        return page_ids
+
+    def set_paths(self, paths):
+        self.close_sources()
+        self.beginResetModel()
+        self.pages = {}
+        self.order = self.new_pages(paths)
+        self.rows = None
+        self.endResetModel()
+
+    def add_paths(self, paths):
+        if not paths:
+            return
+        first = len(self.order)
+        self.beginInsertRows(QModelIndex(), first, first + len(paths) - 1)
+        self.order.extend(self.new_pages(paths))
+        self.rows = None
+        self.endInsertRows()
+
+    def remove_pages(self, page_ids):
+        """Supprimer un ensemble de pages en une fois, par blocs de lignes contigus"""
+        page_ids = {page_id for page_id in page_ids if page_id in self.pages}
+        if not page_ids:
+            return
+        ranges = contiguous_ranges(sorted(self.row_of(page_id) for page_id in page_ids))
+
+        if len(ranges) > MAX_REMOVED_RANGES:
+            # Sélection très morcelée : une seule passe plutôt qu'un décalage de la liste par bloc
+            self.beginResetModel()
+            self.order = [page_id for page_id in self.order if page_id not in page_ids]
+            self.rows = None
+            self.endResetModel()
+        else:
+            for first, last in reversed(ranges):
+                self.beginRemoveRows(QModelIndex(), first, last)
+                del self.order[first:last + 1]
+                self.rows = None
+                self.endRemoveRows()
+            self.renumber(ranges[0][0])
+
+        for page_id in page_ids:
+            del self.pages[page_id]
+
+    def moveRows(self, source_parent, source_row, count, destination_parent, destination_child):
+        """Déplacer un bloc de pages (utilisé par le glisser-déposer de la vue)"""
+        if source_parent.isValid() or destination_parent.isValid():
+            return False
+        last = source_row + count - 1
+        if not self.beginMoveRows(source_parent, source_row, last, destination_parent, destination_child):
+            return False
+        moved = self.order[source_row:last + 1]
+        del self.order[source_row:last + 1]
+        # destination_child est la position d'insertion avant le déplacement
+        insert_at = destination_child - count if destination_child > source_row else destination_child
+        self.order[insert_at:insert_at] = moved
+        self.rows = None
+        self.endMoveRows()
+        self.renumber(min(source_row, insert_at), max(last, insert_at + count - 1))
+        return True
+
+    def move_row(self, row, destination):
+        """Déplacer une page vers une autre ligne sans reconstruire la liste"""
+        if row == destination or not (0 <= row < len(self.order) and 0 <= destination < len(self.order)):
+            return False
+        return self.moveRow(QModelIndex(), row, QModelIndex(), destination + 1 if destination > row else destination)
+
+    def sort_pages(self, key='name'):
+        """Trier les pages (ordre naturel du nom ou dernier nombre du nom), en gardant la sélection"""
+        sort_key = SORT_KEYS[key]
+        self.layoutAboutToBeChanged.emit()
+        previous_order = list(self.order)
+        self.order.sort(key=lambda page_id: sort_key(self.pages[page_id]))
+        self.rows = {page_id: row for row, page_id in enumerate(self.order)}
+
+        # Les index persistants (sélection, ligne courante) suivent leur page
+        persistent = self.persistentIndexList()
+        self.changePersistentIndexList(
+            persistent, [self.index(self.rows[previous_order[index.row()]]) for index in persistent])
+        self.layoutChanged.emit()
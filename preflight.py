@@ -0,0 +1,178 @@
+"""Vérification préalable des pages, avant une conversion
+
+Chaque page est ouverte en ne lisant que son en-tête (dimensions, mode,
+format), sans être décodée ; son contenu est haché pour repérer les doublons
+et la fin du fichier est contrôlée pour repérer les pages tronquées (marqueur
+EOI du JPEG, bloc IEND du PNG...). Les pages sont lues en parallèle. Quelques
+pages réellement encodées avec les réglages choisis servent à estimer la
+taille de l'archive et la durée de la conversion.
+"""
+import io
+import os
+import time
+import hashlib
+import threading
+from collections import namedtuple, Counter
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, UnidentifiedImageError
+
+from converter import can_pass_through, encode_page, fitted_size, is_truncated
+from sources import SourceReader
+
+PageInfo = namedtuple('PageInfo', ['path', 'width', 'height', 'format', 'mode', 'file_size', 'digest',
+                                   'truncated', 'copyable', 'error'])
+# Nombre de pages encodées pour estimer la taille et la durée de la conversion
+SAMPLE_PAGES = 4
+
+
+def inspect_page(reader, path, target_box=None):
+    """Lire l'en-tête d'une page, hacher son contenu et contrôler sa fin"""
+    try:
+        data = reader.read(path)
+    except Exception as e:
+        return PageInfo(path, None, None, None, None, 0, None, None, False, f"lecture impossible : {e}")
+
+    digest = hashlib.sha256(data).hexdigest()
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            target = fitted_size(img.size, target_box) if target_box else img.size
+            return PageInfo(path, img.width, img.height, img.format, img.mode, len(data), digest,
+                            is_truncated(data, img.format), target == img.size and can_pass_through(img, data), None)
+    except UnidentifiedImageError:
+        error = "format d'image non reconnu"
+    except Exception as e:
+        error = str(e)
+    return PageInfo(path, None, None, None, None, len(data), digest, None, False, error)
+
+
+def scan_pages(paths, target_box=None, max_workers=None, on_progress=None):
+    """Inspecter toutes les pages en parallèle ; retourne leurs PageInfo dans l'ordre
+
+    Chaque thread garde son propre SourceReader : une archive n'est ouverte
+    qu'une fois par thread. Le hachage et la lecture libèrent le GIL.
+    """
+    local = threading.local()
+    readers = []
+    lock = threading.Lock()
+
+    def inspect(path):
+        reader = getattr(local, 'reader', None)
+        if reader is None:
+            reader = local.reader = SourceReader()
+            with lock:
+                readers.append(reader)
+        return inspect_page(reader, path, target_box)
+
+    infos = []
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers or min(32, 4 * (os.cpu_count() or 1))) as pool:
+            for info in pool.map(inspect, paths):
+                infos.append(info)
+                if on_progress is not None:
+                    on_progress(len(infos), len(paths))
+    finally:
+        for reader in readers:
+            reader.close()
+    return infos
+
+
+def estimate_conversion(infos, encode_args, workers, sample_pages=SAMPLE_PAGES):
+    """Estimer la taille de l'archive et la durée de conversion
+
+    encode_args sont les réglages passés à encode_page après les octets de la
+    page (EncodeArgs, voir BookConverter.encode_args). Les pages copiées gardent leur
+    taille ; pour les autres, quelques pages réparties dans le livre sont
+    encodées et leurs octets et secondes par pixel sont extrapolés.
+    """
+    passthrough, target_bytes = encode_args.passthrough, encode_args.target_bytes
+    readable = [info for info in infos if info.error is None]
+
+    def is_copied(info):
+        # Comme encode_page : une source plus lourde que la taille cible est réencodée
+        return passthrough and info.copyable and (not target_bytes or info.file_size <= target_bytes)
+
+    copied = [info for info in readable if is_copied(info)]
+    transcoded = [info for info in readable if not is_copied(info)]
+
+    step = max(1, len(transcoded) // sample_pages)
+    sampled_pixels = sampled_bytes = 0
+    sampled_seconds = 0.0
+    sampled = 0
+    with SourceReader() as reader:
+        for info in transcoded[::step][:sample_pages]:
+            try:
+                result = encode_page(reader.read(info.path), *encode_args)
+            except Exception:
+                continue
+            sampled += 1
+            sampled_pixels += info.width * info.height
+            sampled_bytes += len(result.data)
+            sampled_seconds += sum(result.timings.values())
+
+    transcoded_pixels = sum(info.width * info.height for info in transcoded)
+    estimated_bytes = sum(info.file_size for info in copied)
+    estimated_seconds = 0.0
+    if sampled_pixels:
+        estimated_bytes += transcoded_pixels * sampled_bytes / sampled_pixels
+        # Les pages sont encodées en parallèle par le pool
+        estimated_seconds = transcoded_pixels * sampled_seconds / sampled_pixels / max(1, workers)
+    return {
+        'bytes': round(estimated_bytes),
+        'seconds': estimated_seconds,
+        'copied': len(copied),
+        'transcoded': len(transcoded),
+        'sampled': sampled,
+    }
+
+
+def preflight(paths, encode_args, workers=None, on_progress=None):
+    """Vérifier un livre avant sa conversion : pages illisibles, tronquées, en double, et estimations"""
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    infos = scan_pages(paths, target_box=encode_args.target_box, on_progress=on_progress)
+    scanned = time.perf_counter()
+
+    by_digest = {}
+    for info in infos:
+        if info.digest is not None:
+            by_digest.setdefault(info.digest, []).append(info.path)
+    sizes = [(info.width, info.height) for info in infos if info.error is None]
+
+    return {
+        'pages': infos,
+        'count': len(infos),
+        'bytes': sum(info.file_size for info in infos),
+        'formats': Counter(info.format for info in infos if info.error is None),
+        'modes': Counter(info.mode for info in infos if info.error is None),
+        'smallest': min(sizes, key=lambda size: size[0] * size[1]) if sizes else None,
+        'largest': max(sizes, key=lambda size: size[0] * size[1]) if sizes else None,
+        'errors': [(info.path, info.error) for info in infos if info.error is not None],
+        'truncated': [info.path for info in infos if info.truncated],
+        'duplicates': [group for group in by_digest.values() if len(group) > 1],
+        'estimate': estimate_conversion(infos, encode_args, workers),
+        'scan_seconds': scanned - start,
+    }
+
+
+def report_lines(report):
+    """Résumé lisible d'une vérification, une ligne par constat (console et interface)"""
+    lines = [
+        f"{report['count']} page(s), {report['bytes'] / 1e6:.1f} Mo lus en {report['scan_seconds']:.2f} s — "
+        + ", ".join(f"{name} : {count}" for name, count in report['formats'].most_common())
+        + " — modes " + ", ".join(f"{name} : {count}" for name, count in report['modes'].most_common())
+    ]
+    if report['largest'] is not None:
+        lines.append(f"Dimensions : de {report['smallest'][0]}×{report['smallest'][1]} "
+                     f"à {report['largest'][0]}×{report['largest'][1]} pixels")
+    for path, error in report['errors']:
+        lines.append(f"❌ {os.path.basename(path)} : {error}")
+    for path in report['truncated']:
+        lines.append(f"⚠️ {os.path.basename(path)} : fichier tronqué (marqueur de fin absent)")
+    for group in report['duplicates']:
+        lines.append("⚠️ Pages identiques : " + ", ".join(os.path.basename(path) for path in group))
+
+    estimate = report['estimate']
+    lines.append(f"Estimation : {estimate['bytes'] / 1e6:.1f} Mo, environ {estimate['seconds']:.0f} s "
+                 f"({estimate['copied']} page(s) copiée(s), {estimate['transcoded']} réencodée(s), "
+                 f"{estimate['sampled']} encodée(s) pour l'estimation)")
+    return lines
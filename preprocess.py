@@ -0,0 +1,141 @@
+"""Pré-traitement des pages scannées : doubles pages coupées en deux, marges rognées, pages redressées
+
+Les statistiques de page (couleur du fond, lignes et colonnes qui contiennent
+du contenu, profil des lignes de texte) sont calculées sur une copie réduite
+en niveaux de gris, par des opérations Pillow qui traitent toute l'image d'un
+coup (différence, seuil, réduction BOX à une seule colonne ou une seule
+ligne) : leur coût dépend à peine de la résolution du scan.
+"""
+import math
+from PIL import Image, ImageChops
+
+# Plus grand côté de la copie réduite sur laquelle la page est analysée
+ANALYSIS_SIZE = 512
+# Écart de niveau de gris au-delà duquel un pixel n'est plus du fond
+CROP_TOLERANCE = 24
+# Part minimale de pixels de contenu (sur 255) pour qu'une ligne ou une colonne ne soit pas une marge
+CONTENT_THRESHOLD = 3
+# Marge gardée autour du contenu, en fraction du plus grand côté de la page
+CROP_MARGIN = 0.01
+# Rognage maximal prévu lors d'un décodage à échelle réduite, pour garder la résolution cible après rognage
+MAX_CROP = 0.2
+# Inclinaisons essayées (en degrés) et gain de contraste exigé pour redresser une page
+MAX_SKEW = 3.0
+SKEW_STEP = 0.25
+SKEW_MIN_GAIN = 1.1
+INK_THRESHOLD = 128
+
+
+def is_spread(size):
+    """Double page scannée d'un bloc : image en paysage"""
+    return size[0] > size[1]
+
+
+def spread_parts(right_to_left=False):
+    """Moitiés d'une double page dans l'ordre de lecture (la droite d'abord pour un manga)"""
+    return ('right', 'left') if right_to_left else ('left', 'right')
+
+
+def part_box(size, part):
+    """Zone d'une image occupée par une moitié de double page (toute l'image si part est None)"""
+    width, height = size
+    if part == 'left':
+        return (0, 0, width // 2, height)
+    if part == 'right':
+        return (width // 2, 0, width, height)
+    return (0, 0, width, height)
+
+
+def analysis_image(img):
+    """Copie réduite en niveaux de gris (au plus ANALYSIS_SIZE pixels de côté) d'une page RGB ou L"""
+    factor = math.ceil(max(img.size) / ANALYSIS_SIZE)
+    small = img.reduce(factor) if factor > 1 else img
+    return small.convert('L')
+
+
+def row_profile(mask):
+    """Moyenne de chaque ligne d'une image L (0 à 255), calculée d'un bloc par une réduction BOX"""
+    return mask.resize((1, mask.height), Image.Resampling.BOX).tobytes()
+
+
+def column_profile(mask):
+    """Moyenne de chaque colonne d'une image L (0 à 255)"""
+    return mask.resize((mask.width, 1), Image.Resampling.BOX).tobytes()
+
+
+def content_box(gray, tolerance=CROP_TOLERANCE):
+    """Boîte du contenu d'une page sans ses marges uniformes ; None s'il n'y a rien à rogner
+
+    Le fond est la couleur des coins : si les coins diffèrent, les bords ne
+    sont pas uniformes (image à fond perdu) et la page est gardée entière.
+    Une ligne ou une colonne n'est une marge que si presque aucun de ses
+    pixels ne s'écarte du fond, ce qui ignore les poussières isolées.
+    """
+    width, height = gray.size
+    corners = sorted(gray.getpixel(xy) for xy in ((0, 0), (width - 1, 0), (0, height - 1), (width - 1, height - 1)))
+    if corners[3] - corners[0] > tolerance:
+        return None
+    background = (corners[1] + corners[2]) // 2
+
+    mask = ImageChops.difference(gray, Image.new('L', gray.size, background))
+    mask = mask.point(lambda value: 255 if value > tolerance else 0)
+    rows = [y for y, value in enumerate(row_profile(mask)) if value >= CONTENT_THRESHOLD]
+    columns = [x for x, value in enumerate(column_profile(mask)) if value >= CONTENT_THRESHOLD]
+    if not rows or not columns:
+        # Page blanche : rien à rogner
+        return None
+    box = (columns[0], rows[0], columns[-1] + 1, rows[-1] + 1)
+    return None if box == (0, 0, width, height) else box
+
+
+def scale_box(box, small_size, size):
+    """Ramener une boîte de la copie réduite aux coordonnées de la page, avec une petite marge"""
+    scale_x = size[0] / small_size[0]
+    scale_y = size[1] / small_size[1]
+    margin = round(CROP_MARGIN * max(size))
+    return (max(0, math.floor(box[0] * scale_x) - margin), max(0, math.floor(box[1] * scale_y) - margin),
+            min(size[0], math.ceil(box[2] * scale_x) + margin), min(size[1], math.ceil(box[3] * scale_y) + margin))
+
+
+def detect_skew(gray):
+    """Inclinaison (en degrés) qui redresse une page ; 0 si elle paraît droite
+
+    Pour chaque angle essayé, on mesure le contraste du profil des lignes
+    (variance des moyennes de ligne des pixels sombres) : il est maximal quand
+    les lignes de texte et les bords des cases sont horizontaux.
+    """
+    ink = gray.point(lambda value: 255 if value < INK_THRESHOLD else 0)
+
+    def contrast(angle):
+        rows = row_profile(ink.rotate(angle, Image.Resampling.BILINEAR) if angle else ink)
+        mean = sum(rows) / len(rows)
+        return sum((value - mean) ** 2 for value in rows) / len(rows)
+
+    straight = contrast(0.0)
+    best_angle, best = 0.0, straight
+    for step in range(1, round(MAX_SKEW / SKEW_STEP) + 1):
+        for angle in (step * SKEW_STEP, -step * SKEW_STEP):
+            value = contrast(angle)
+            if value > best:
+                best_angle, best = angle, value
+    return best_angle if best > straight * SKEW_MIN_GAIN else 0.0
+
+
+def straighten_and_trim(img, autocrop=False, deskew=False):
+    """Redresser puis rogner une page décodée (RGB ou L) ; retourne la page et vrai si elle a changé"""
+    gray = analysis_image(img)
+    changed = False
+    if deskew:
+        angle = detect_skew(gray)
+        if angle:
+            # Les coins découverts par la rotation sont blancs, comme le papier
+            white = 255 if img.mode == 'L' else (255, 255, 255)
+            img = img.rotate(angle, Image.Resampling.BICUBIC, fillcolor=white)
+            gray = gray.rotate(angle, Image.Resampling.BILINEAR, fillcolor=255)
+            changed = True
+    if autocrop:
+        box = content_box(gray)
+        if box is not None:
+            img = img.crop(scale_box(box, gray.size, img.size))
+            changed = True
+    return img, changed
@@ -0,0 +1,33 @@
+"""Profils de sortie et codecs des pages : de simples définitions, importables sans Pillow ni Qt
+
+L'interface en a besoin pour remplir ses listes au démarrage, avant que
+Pillow ne soit chargé.
+"""
+from collections import namedtuple
+
+JPEG_QUALITY = 95
+
+# Profils de sortie : boîte cible (largeur, hauteur), filtre de rééchantillonnage, qualité JPEG
+OutputProfile = namedtuple('OutputProfile', ['label', 'size', 'resample', 'quality'])
+PROFILES = {
+    'original': OutputProfile("Taille d'origine", None, None, JPEG_QUALITY),
+    'kobo-clara': OutputProfile("Kobo Clara (1072×1448)", (1072, 1448), 'lanczos', 90),
+    'kindle-paperwhite': OutputProfile("Kindle Paperwhite (1236×1648)", (1236, 1648), 'lanczos', 90),
+    'kobo-libra': OutputProfile("Kobo Libra (1264×1680)", (1264, 1680), 'lanczos', 90),
+    'tablette': OutputProfile("Tablette (1536×2048)", (1536, 2048), 'bicubic', 90),
+}
+DEFAULT_PROFILE = 'original'
+
+# Codecs des pages : format Pillow, extension, type MIME, options d'enregistrement et qualité par défaut
+# (None : celle du profil). Seul le JPEG de base permet de copier les JPEG source sans les réencoder.
+PageCodec = namedtuple('PageCodec', ['label', 'format', 'extension', 'media_type', 'options', 'quality'])
+CODECS = {
+    'jpeg': PageCodec("JPEG", 'JPEG', '.jpg', 'image/jpeg', {}, None),
+    'jpeg-progressive': PageCodec("JPEG progressif optimisé", 'JPEG', '.jpg', 'image/jpeg',
+                                  {'progressive': True, 'optimize': True}, None),
+    'webp': PageCodec("WebP", 'WEBP', '.webp', 'image/webp', {'method': 4}, 80),
+    'webp-lossless': PageCodec("WebP sans perte", 'WEBP', '.webp', 'image/webp', {'lossless': True, 'method': 4}, 80),
+    'avif': PageCodec("AVIF", 'AVIF', '.avif', 'image/avif', {'speed': 6}, 60),
+    'jxl': PageCodec("JPEG XL", 'JXL', '.jxl', 'image/jxl', {}, 80),
+}
+DEFAULT_CODEC = 'jpeg'
@@ -0,0 +1,225 @@
+"""Sources des pages : fichiers image ou pages d'une archive (CBZ/ZIP, CBR/RAR, PDF)
+
+Une page d'archive est désignée par « <archive>::<entrée> », ce qui permet de
+la traiter partout comme un chemin (liste des pages, journal, trace) ; son
+nom de base est celui de l'entrée. Les entrées sont lues directement depuis
+l'archive, sans extraction sur disque.
+"""
+import os
+import io
+import re
+import zipfile
+
+# Les pages WebP, AVIF et JPEG XL écrites par l'application peuvent aussi être relues
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff', '.webp', '.avif', '.jxl')
+ARCHIVE_SEPARATOR = "::"
+ZIP_EXTENSIONS = ('.cbz', '.zip')
+RAR_EXTENSIONS = ('.cbr', '.rar')
+PDF_EXTENSIONS = ('.pdf',)
+ARCHIVE_EXTENSIONS = ZIP_EXTENSIONS + RAR_EXTENSIONS + PDF_EXTENSIONS
+
+
+def natural_key(path):
+    """Clé de tri naturel : page2 avant page10"""
+    return [int(part) if part.isdigit() else part.lower()
+            for part in re.split(r'(\d+)', os.path.basename(path))]
+
+
+def numeric_suffix_key(path):
+    """Clé de tri sur le dernier nombre du nom de fichier : scan_v2_p013 trié par 13"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    numbers = re.findall(r'\d+', name)
+    # Les noms sans numéro passent après, dans l'ordre naturel
+    return (0, int(numbers[-1]), natural_key(path)) if numbers else (1, 0, natural_key(path))
+
+
+def list_images(directory):
+    """Lister les images d'un dossier dans l'ordre naturel des noms de fichiers"""
+    return sorted(
+        (os.path.join(directory, name) for name in os.listdir(directory)
+         if name.lower().endswith(IMAGE_EXTENSIONS)),
+        key=natural_key
+    )
+
+
+def book_pages(path):
+    """Pages d'un livre : images d'un dossier ou pages d'une archive"""
+    return list_archive_pages(path) if is_archive(path) else list_images(path)
+
+
+def book_name(path):
+    """Nom du livre : nom du dossier, ou de l'archive sans son extension"""
+    name = os.path.basename(os.path.normpath(path))
+    return os.path.splitext(name)[0] if is_archive(path) else name
+
+
+def chapter_breaks(paths):
+    """Début et titre de chaque chapitre : un chapitre par dossier, archive ou dossier d'archive
+
+    Retourne une liste (indice de la première page, titre). Un livre d'une
+    seule source forme un unique chapitre « Début ».
+    """
+    breaks = []
+    previous = None
+    for i, path in enumerate(paths):
+        archive_path, name = split_member(path)
+        if name is None:
+            key = (os.path.dirname(path), '')
+        else:
+            key = (archive_path, os.path.dirname(name))
+        if key != previous:
+            breaks.append((i, os.path.basename(key[1]) if key[1] else book_name(key[0])))
+            previous = key
+    if len(breaks) <= 1:
+        return [(0, "Début")]
+    return breaks
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def member_path(archive_path, name):
+    return f"{archive_path}{ARCHIVE_SEPARATOR}{name}"
+
+
+def split_member(path):
+    """Séparer une page d'archive en (archive, entrée) ; (chemin, None) pour un fichier ordinaire"""
+    archive_path, separator, name = path.partition(ARCHIVE_SEPARATOR)
+    if not separator or not is_archive(archive_path):
+        return path, None
+    return archive_path, name
+
+
+def source_file(path):
+    """Fichier sur disque qui contient la page (l'archive pour une page d'archive)"""
+    return split_member(path)[0]
+
+
+def is_page_entry(name):
+    """Entrée d'archive qui est une image de page (ni dossier, ni fichier caché, ni métadonnées macOS)"""
+    base = os.path.basename(name)
+    return (name.lower().endswith(IMAGE_EXTENSIONS) and not base.startswith('.')
+            and not name.startswith('__MACOSX/'))
+
+
+def load_rarfile():
+    """Module rarfile, importé à la première archive CBR ; None s'il n'est pas installé"""
+    try:
+        import rarfile
+    except ImportError:
+        # Lecture des CBR impossible sans le module rarfile (et l'outil unrar)
+        return None
+    return rarfile
+
+
+def load_pdf_reader():
+    """Lecteur de PDF de pypdf, importé au premier PDF (pypdf est long à charger) ; None s'il n'est pas installé"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    return PdfReader
+
+
+def open_archive(archive_path):
+    """Ouvrir une archive en lecture ; seul son répertoire central (ou sa table des pages) est lu"""
+    lower = archive_path.lower()
+    if lower.endswith(ZIP_EXTENSIONS):
+        return zipfile.ZipFile(archive_path)
+    if lower.endswith(RAR_EXTENSIONS):
+        rarfile = load_rarfile()
+        if rarfile is None:
+            raise ValueError("le module rarfile est nécessaire pour lire les CBR (pip install rarfile)")
+        return rarfile.RarFile(archive_path)
+    pdf_reader = load_pdf_reader()
+    if pdf_reader is None:
+        raise ValueError("le module pypdf est nécessaire pour lire les PDF (pip install pypdf)")
+    return PdfArchive(archive_path, pdf_reader)
+
+
+def list_archive_pages(archive_path):
+    """Lister les pages d'une archive dans l'ordre naturel des noms d'entrée"""
+    with open_archive(archive_path) as archive:
+        names = [name for name in archive.namelist() if is_page_entry(name)]
+    return [member_path(archive_path, name) for name in sorted(names, key=natural_key)]
+
+
+def expand_sources(paths):
+    """Remplacer chaque archive de la liste par ses pages, dans l'ordre"""
+    pages = []
+    for path in paths:
+        if is_archive(path):
+            pages.extend(list_archive_pages(path))
+        else:
+            pages.append(path)
+    return pages
+
+
+class PdfArchive:
+    """Vue d'un PDF d'images comme une archive : une entrée par page, la plus grande image de la page"""
+
+    def __init__(self, path, pdf_reader):
+        self.file = open(path, 'rb')
+        self.reader = pdf_reader(self.file)
+
+    def namelist(self):
+        # L'extension sert seulement à reconnaître une image ; le format réel est détecté au décodage
+        return [f"page_{number:04d}.jpg" for number in range(1, len(self.reader.pages) + 1)]
+
+    def read(self, name):
+        number = int(os.path.splitext(name)[0].rpartition('_')[2])
+        images = self.reader.pages[number - 1].images
+        if not images:
+            raise ValueError("aucune image sur cette page du PDF")
+        return max(images, key=lambda image: len(image.data)).data
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SourceReader:
+    """Lire des pages en gardant les archives ouvertes : le répertoire central n'est lu qu'une fois"""
+
+    def __init__(self):
+        self.archives = {}
+
+    def archive(self, archive_path):
+        archive = self.archives.get(archive_path)
+        if archive is None:
+            archive = self.archives[archive_path] = open_archive(archive_path)
+        return archive
+
+    def read(self, path):
+        archive_path, name = split_member(path)
+        if name is None:
+            with open(path, 'rb') as f:
+                return f.read()
+        return self.archive(archive_path).read(name)
+
+    def open(self, path):
+        """Ouvrir une page comme un fichier : pour lire un en-tête, seul le début est lu (et décompressé)"""
+        archive_path, name = split_member(path)
+        if name is None:
+            return open(path, 'rb')
+        archive = self.archive(archive_path)
+        if isinstance(archive, zipfile.ZipFile):
+            return archive.open(name)
+        return io.BytesIO(archive.read(name))
+
+    def close(self):
+        for archive in self.archives.values():
+            archive.close()
+        self.archives.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
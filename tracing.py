@@ -0,0 +1,98 @@
+"""Trace des temps de traitement par page, en JSON lines ou au format Chrome trace
+
+Un fichier « .jsonl » reçoit une ligne JSON par page écrite. Tout autre nom
+produit un fichier Chrome trace (tableau d'événements « X ») lisible dans
+chrome://tracing ou https://ui.perfetto.dev, avec une piste par processus
+d'encodage et une piste pour l'écriture de l'archive.
+"""
+import os
+import json
+import threading
+
+TRACE_STAGES = ('read', 'decode', 'convert', 'encode', 'write')
+
+
+class PageTracer:
+    """Écrire les mesures par page dans un fichier de trace
+
+    Peut être partagé entre plusieurs conversions simultanées (un lot de la
+    ligne de commande) : les écritures sont protégées par un verrou.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.chrome = not path.lower().endswith('.jsonl')
+        self.lock = threading.Lock()
+        self.track_ids = {}
+        self.first_event = True
+        self.file = open(path, 'w', encoding='utf-8')
+        if self.chrome:
+            self.file.write('[\n')
+
+    def record(self, event):
+        """Enregistrer la mesure d'une page (dictionnaire émis par BookConverter)"""
+        with self.lock:
+            if self.chrome:
+                for trace_event in self.chrome_events(event):
+                    self.write_chrome_event(trace_event)
+            else:
+                self.file.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+    def chrome_events(self, event):
+        """Découper la mesure d'une page en un événement par étape, sur la piste où elle s'est exécutée"""
+        args = {'book': event['book'], 'page': event['page'], 'action': event['action'],
+                'bytes_in': event['bytes_in'], 'bytes_out': event['bytes_out']}
+        main_pid = os.getpid()
+
+        tracks = {
+            'read': (main_pid, 'lecture'),
+            'decode': (event['pid'], 'encodage'),
+            'convert': (event['pid'], 'encodage'),
+            'encode': (event['pid'], 'encodage'),
+            'write': (main_pid, 'écriture'),
+        }
+        for stage in TRACE_STAGES:
+            started = event['started'].get(stage)
+            if started is None:
+                continue
+            pid, track = tracks[stage]
+            if pid != main_pid:
+                track_name = f"{track} {pid}"
+            else:
+                track_name = f"{event['book']} · {track}"
+            tid = yield from self.track_id(pid, track_name)
+            yield {
+                'name': f"{stage} p{event['page']}",
+                'cat': stage,
+                'ph': 'X',
+                'ts': started * 1e6,
+                'dur': event[stage] * 1e6,
+                'pid': pid,
+                'tid': tid,
+                'args': args,
+            }
+
+    def track_id(self, pid, track_name):
+        """Identifiant numérique d'une piste ; la première fois, produit les événements qui la nomment"""
+        key = (pid, track_name)
+        if key not in self.track_ids:
+            self.track_ids[key] = len(self.track_ids) + 1
+            process_name = 'Conversion' if pid == os.getpid() else f"Processus d'encodage {pid}"
+            yield {'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': process_name}}
+            yield {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': self.track_ids[key],
+                   'args': {'name': track_name}}
+        return self.track_ids[key]
+
+    def write_chrome_event(self, trace_event):
+        if not self.first_event:
+            self.file.write(',\n')
+        self.first_event = False
+        self.file.write(json.dumps(trace_event, ensure_ascii=False))
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            if self.chrome:
+                self.file.write('\n]\n')
+            self.file.close()